@@ -0,0 +1,80 @@
+"""Analiza wsadowa pozycji: najlepszy ruch, wynik, glebokosc i liczba wezlow.
+
+    python analyze.py positions.txt --depth 3 --workers 4 -o results.jsonl
+
+Positions are streamed from the file (format in positions.py) to a
+process pool and one JSON line per position is written as soon as it is
+ready, in input order. A position that cannot be parsed or loaded gets
+an ``{"index": i, "error": ...}`` line and the batch goes on. With
+--trace-memory every result also has ``peak_bytes``, the peak allocation
+of its search as measured by tracemalloc.
+"""
+import argparse
+import json
+import sys
+import time
+from multiprocessing import Pool
+
+from last_min import KropkiGame, AIPlayer, RED, BLUE
+from positions import read_blocks, parse_position
+
+worker_settings = {}
+
+
+def init_worker(settings):
+    worker_settings.update(settings)
+
+
+def analyze_position(item):
+    index, (start, lines) = item
+    t0 = time.perf_counter()
+    try:
+        # parsed here, so a malformed block is reported like any other bad position
+        state = parse_position(lines, start)
+        game = KropkiGame(headless=True)
+        game.load_state(state)
+        player_id = state['turn']
+        ai = AIPlayer(player_id, RED if player_id == 2 else BLUE, "AI", **worker_settings)
+        result = ai.analyze(game)
+    except ValueError as e:
+        return {'index': index, 'error': str(e)}
+    result['index'] = index
+    if ai.trace_memory:
+        result['peak_bytes'] = ai.last_peak_memory
+    result['time'] = round(time.perf_counter() - t0, 3)
+    return result
+
+
+def numbered(f):
+    for index, block in enumerate(read_blocks(f)):
+        yield index, block
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analiza wsadowa pozycji Kropek")
+    parser.add_argument('input', help="plik z pozycjami ('-' = stdin)")
+    parser.add_argument('-o', '--output', default='-', help="plik wynikowy JSON lines ('-' = stdout)")
+    parser.add_argument('--depth', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=4)
+    parser.add_argument('--memory-mb', type=int, default=64, help="budzet pamieci na proces")
+    parser.add_argument('--trace-memory', action='store_true', help="szczyt pamieci kazdej pozycji (wolniej)")
+    args = parser.parse_args()
+
+    settings = {'depth': args.depth, 'memory_budget_mb': args.memory_mb, 'trace_memory': args.trace_memory}
+    src = sys.stdin if args.input == '-' else open(args.input)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w')
+    try:
+        with Pool(args.workers, initializer=init_worker, initargs=(settings,)) as pool:
+            for result in pool.imap(analyze_position, numbered(src), chunksize=args.chunksize):
+                out.write(json.dumps(result) + '\n')
+                out.flush()
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Wektorowa ocena wielu plansz naraz (NumPy).
+
+The same heuristic as ``AIPlayer.evaluate_board`` in last_min.py, written as
+8-neighbour counts over a stack of K boards so all K scores come out of one
+pass. Boards are ``owners`` (K, N, N) int8 with 0/1/2 and ``captured``
+(K, N, N) bool.
+"""
+import numpy as np
+
+from last_min import EVAL_WEIGHTS
+
+FEATURES = [
+    'my_score',        # moje zdobyte punkty
+    'enemy_score',     # punkty przeciwnika
+    'my_isolated',     # moja kropka bez sasiadow
+    'my_one',          # 1 moj sasiad
+    'my_two',          # 2 moich sasiadow
+    'my_cluster',      # 3+ moich sasiadow
+    'my_contact',      # moja kropka styka sie z wrogiem
+    'enemy_cluster',   # kropka wroga z 3+ sasiadami wroga
+    'pressure',        # kropka wroga otaczana (my_n >= 2, en_n <= my_n)
+    'trapped',         # kropka wroga prawie zamknieta (my_n >= 3)
+]
+
+
+def weight_vector(weights):
+    return np.array([weights[name] for name in FEATURES], dtype=np.float64)
+
+
+# wagi domyslne AIPlayer.evaluate_board
+WEIGHTS = weight_vector(EVAL_WEIGHTS)
+
+NOISE = 4.0
+
+
+def board_arrays(game):
+    owners = np.array([[cell['owner'] for cell in row] for row in game.grid], dtype=np.int8)
+    captured = np.array([[cell['captured'] for cell in row] for row in game.grid], dtype=bool)
+    return owners, captured
+
+
+def neighbor_counts(mask):
+    """Liczba sasiadow (8 kierunkow) dla kazdego pola, mask: (K, N, N) bool."""
+    n = mask.shape[-1]
+    padded = np.pad(mask.astype(np.int8), ((0, 0), (1, 1), (1, 1)))
+    counts = np.zeros(mask.shape, dtype=np.int8)
+    for dr in (0, 1, 2):
+        for dc in (0, 1, 2):
+            if dr == 1 and dc == 1:
+                continue
+            counts += padded[:, dr:dr + n, dc:dc + n]
+    return counts
+
+
+def extract_features(owners, captured, my_scores, enemy_scores, player_id):
+    """Macierz cech (K, len(FEATURES)) dla gracza player_id."""
+    enemy_id = 3 - player_id
+    alive = ~captured
+    mine = (owners == player_id) & alive
+    theirs = (owners == enemy_id) & alive
+    my_n = neighbor_counts(mine)
+    en_n = neighbor_counts(theirs)
+
+    def count(mask):
+        return mask.sum(axis=(1, 2))
+
+    features = np.empty((owners.shape[0], len(FEATURES)), dtype=np.float64)
+    features[:, 0] = my_scores
+    features[:, 1] = enemy_scores
+    features[:, 2] = count(mine & (my_n == 0))
+    features[:, 3] = count(mine & (my_n == 1))
+    features[:, 4] = count(mine & (my_n == 2))
+    features[:, 5] = count(mine & (my_n >= 3))
+    features[:, 6] = count(mine & (en_n > 0))
+    features[:, 7] = count(theirs & (en_n >= 3))
+    features[:, 8] = count(theirs & (my_n >= 2) & (en_n <= my_n))
+    features[:, 9] = count(theirs & (my_n >= 3))
+    return features
+
+
+def evaluate_batch(owners, captured, my_scores, enemy_scores, player_id, weights=WEIGHTS, noise=NOISE):
+    scores = extract_features(owners, captured, my_scores, enemy_scores, player_id) @ weights
+    if noise:
+        scores += np.random.uniform(-noise, noise, size=scores.shape[0])
+    return scores
+
+
+def gather_children(game, mover_id, player_id):
+    """Wszystkie pozycje po jednym ruchu gracza mover_id, jako stos tablic.
+
+    Only moves that capture need a full grid copy; every other child is the
+    parent array with one extra dot.
+    """
+    moves = game.legal_moves()
+    k = len(moves)
+    owners0, captured0 = board_arrays(game)
+    owners = np.broadcast_to(owners0, (k,) + owners0.shape).copy()
+    captured = np.broadcast_to(captured0, (k,) + captured0.shape).copy()
+    my_scores = np.empty(k)
+    enemy_scores = np.empty(k)
+    enemy_id = 3 - player_id
+    total = game.player1.score + game.player2.score
+
+    for i, (r, c) in enumerate(moves):
+        snap = game.snapshot()
+        game.grid[r][c]['owner'] = mover_id
+        game.check_for_cycles_around(r, c)
+        if game.player1.score + game.player2.score != total:
+            owners[i], captured[i] = board_arrays(game)
+        else:
+            owners[i, r, c] = mover_id
+        my_scores[i] = game.players[player_id].score
+        enemy_scores[i] = game.players[enemy_id].score
+        game.restore(snap)
+
+    return moves, owners, captured, my_scores, enemy_scores
@@ -0,0 +1,72 @@
+"""Lancuchy kropek: skladowe 8-spojne kazdego gracza w strukturze union-find.
+
+A fence can only close when a new dot touches the same component twice,
+so ``add`` tells the game whether a cycle search is worth running at all.
+``loop`` marks components that already contain a cycle; only those can
+capture a dot that is placed inside them.
+
+There is no path compression, so every change is a small record in
+``history`` and ``undo(mark)`` rolls the structure back for the search.
+Dots that get captured stay in their component; that only makes the
+components coarser, so the gate may let through a useless search but
+never skips a needed one.
+"""
+
+
+class ChainSets:
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+        self.loop = {}
+        self.history = []
+
+    def find(self, p):
+        while self.parent[p] != p:
+            p = self.parent[p]
+        return p
+
+    def has_loop(self, p):
+        return p in self.parent and self.loop[self.find(p)]
+
+    def add(self, p, neighbors):
+        """Dodaje kropke p polaczona z neighbors; True gdy moze zamknac obwod."""
+        self.parent[p] = p
+        self.size[p] = 1
+        self.loop[p] = False
+        self.history.append(('new', p))
+
+        roots = [self.find(q) for q in neighbors if q in self.parent]
+        closes = len(set(roots)) < len(roots)
+
+        root = p
+        for b in set(roots):
+            a = root
+            if self.size[a] < self.size[b]:
+                a, b = b, a
+            self.history.append(('union', b, a, self.size[a], self.loop[a]))
+            self.parent[b] = a
+            self.size[a] += self.size[b]
+            self.loop[a] = self.loop[a] or self.loop[b]
+            root = a
+
+        if closes and not self.loop[root]:
+            self.history.append(('loop', root))
+            self.loop[root] = True
+        return closes
+
+    def mark(self):
+        return len(self.history)
+
+    def undo(self, mark):
+        while len(self.history) > mark:
+            entry = self.history.pop()
+            if entry[0] == 'new':
+                p = entry[1]
+                del self.parent[p], self.size[p], self.loop[p]
+            elif entry[0] == 'union':
+                _, b, a, size, loop = entry
+                self.parent[b] = b
+                self.size[a] = size
+                self.loop[a] = loop
+            else:
+                self.loop[entry[1]] = False
@@ -0,0 +1,99 @@
+"""Klient testowy serwera Kropki: gra wiele gier naraz losowymi ruchami."""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+class Connection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.next_id = 0
+        self.listener = asyncio.create_task(self.listen())
+
+    async def listen(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            response = json.loads(line)
+            future = self.pending.pop(response.get('id'), None)
+            if future is not None and not future.done():
+                future.set_result(response)
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("server closed the connection"))
+
+    async def request(self, **request):
+        self.next_id += 1
+        request['id'] = self.next_id
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.writer.write(json.dumps(request).encode() + b"\n")
+        await self.writer.drain()
+        return await future
+
+    async def close(self):
+        self.writer.close()
+        self.listener.cancel()
+
+
+async def play_game(conn, depth, stats):
+    response = await conn.request(cmd='new', ai=2, depth=depth)
+    game_id = response['game']
+    while response['ok'] and not response['state']['game_over']:
+        state = response['state']
+        moves = [
+            (r, c)
+            for r, (owners, captured) in enumerate(zip(state['owners'], state['captured']))
+            for c, (owner, cap) in enumerate(zip(owners, captured))
+            if owner == 0 and not cap
+        ]
+        r, c = random.choice(moves)
+        t0 = time.perf_counter()
+        response = await conn.request(cmd='move', game=game_id, row=r, col=c)
+        stats['latency'].append(time.perf_counter() - t0)
+    if not response['ok']:
+        stats['errors'] += 1
+        return
+    stats['finished'] += 1
+    stats['ai_timeouts'] += response['ai_timeouts']
+    await conn.request(cmd='close', game=game_id)
+
+
+async def run(args):
+    if args.unix:
+        streams = [await asyncio.open_unix_connection(args.unix) for _ in range(args.connections)]
+    else:
+        streams = [await asyncio.open_connection(args.host, args.port) for _ in range(args.connections)]
+    conns = [Connection(reader, writer) for reader, writer in streams]
+    stats = {'finished': 0, 'errors': 0, 'ai_timeouts': 0, 'latency': []}
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(play_game(conns[i % len(conns)], args.depth, stats) for i in range(args.games)))
+    elapsed = time.perf_counter() - t0
+    for conn in conns:
+        await conn.close()
+
+    latency = sorted(stats['latency']) or [0.0]
+    print(f"gry: {stats['finished']}/{args.games}, bledy: {stats['errors']}, timeouty AI: {stats['ai_timeouts']}")
+    print(f"czas: {elapsed:.1f}s, ruchy: {len(stats['latency'])}, "
+          f"p50: {latency[len(latency) // 2] * 1000:.0f}ms, p99: {latency[int(len(latency) * 0.99)] * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Klient testowy serwera Kropki")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix')
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--connections', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,18 @@ import pygame
 import random
 import sys
 import copy
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+from symmetry import SymmetryHash
+from chains import ChainSets
+from tables import BoundedTable
+from threats import ThreatMap, capture_candidates, encloses_enemy
+from timeman import SearchTimeout
+from telemetry import DISABLED, from_env
 
 # --- Ustawienia wymiarów ---
 WINDOW_GRID_SIZE = 25
@@ -13,6 +25,8 @@ WIDTH = (WINDOW_GRID_SIZE - 1) * CELL_MARGIN + 2 * CELL_MARGIN
 HEIGHT = WIDTH + UI_HEIGHT
 DOT_RADIUS = 6
 OFFSET = ((WINDOW_GRID_SIZE - LOGICAL_GRID_SIZE) * CELL_MARGIN) // 2
+# pixel of the board point (0, 0) in the game window
+BOARD_ORIGIN = (CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + OFFSET)
 
 # Kolory
 BG_COLOR = (245, 245, 220)
@@ -22,6 +36,46 @@ RED = (255, 0, 0)
 TEXT_BG = (230, 230, 210)
 GRAY = (100, 100, 100)
 LAST_MOVE_COLOR = (255, 215, 0)
+CAPTURED_EMPTY_COLOR = (200, 200, 180)
+HEATMAP_ALPHA = 110
+
+# find_cycle steps between two calls of KropkiGame.poll
+POLL_STEPS = 64
+
+
+class EndgameAbort(Exception):
+    pass
+
+
+# wagi oceny pozycji; weights.json (tuning.py) nadpisuje je przy starcie AI
+EVAL_WEIGHTS = {
+    'my_score': 5000,
+    'enemy_score': -4000,
+    'my_isolated': -50,
+    'my_one': 100,
+    'my_two': 200,
+    'my_cluster': 400,
+    'my_contact': 50,
+    'enemy_cluster': -100,
+    'pressure': 200,
+    'trapped': 350,
+}
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'weights.json')
+
+
+def load_weights(path):
+    with open(path) as f:
+        loaded = json.load(f)
+    unknown = set(loaded) - set(EVAL_WEIGHTS)
+    if unknown:
+        raise ValueError(f"unknown weights in {path}: {', '.join(sorted(unknown))}")
+    weights = dict(EVAL_WEIGHTS)
+    weights.update(loaded)
+    return weights
+
+
+# rodzaj wpisu w tablicy transpozycji
+TT_EXACT, TT_LOWER, TT_UPPER = 0, 1, 2
 
 
 class Player:
@@ -34,16 +88,71 @@ class Player:
 
 
 class AIPlayer(Player):
-    def __init__(self, player_id, color, name, depth=3):
+    def __init__(self, player_id, color, name, depth=3, batch_leaves=False,
+                 quiescence=True, q_depth=4, q_node_limit=100,
+                 use_pvs=True, aspiration_window=300,
+                 endgame_empty=0, endgame_node_limit=5000, endgame_time_limit=0.5,
+                 use_tt=True, memory_budget_mb=64, tt_policy='depth', trace_memory=False,
+                 weights_file=WEIGHTS_FILE, time_manager=None, smp_helpers=0):
         super().__init__(player_id, color, name)
         self.is_ai = True
         self.depth = depth
+        self.weights = dict(EVAL_WEIGHTS)
+        if weights_file and os.path.exists(weights_file):
+            self.weights = load_weights(weights_file)
+        # batch_leaves: last ply evaluated as one NumPy batch (batch_eval.py); the batch
+        # is a static evaluation, so it cannot be combined with quiescence
+        if batch_leaves and quiescence:
+            raise ValueError("batch_leaves needs quiescence=False")
+        self.batch_leaves = batch_leaves
+        # quiescence: at depth 0 keep playing captures / capture blocks,
+        # at most q_node_limit simulations for each leaf
+        self.quiescence = quiescence
+        self.q_depth = q_depth
+        self.q_node_limit = q_node_limit
+        self.q_nodes = 0
+        # use_pvs: null-window scouts after the first move; aspiration_window: None = full window
+        self.use_pvs = use_pvs
+        self.aspiration_window = aspiration_window
+        self.nodes = 0
+        # pv_lines: best line below a node, by remaining depth; only kept during multipv
+        self.pv_lines = None
+        # endgame_empty: with this many empty cells or fewer the position is solved exactly
+        # (0 = off); per move at most endgame_node_limit nodes and endgame_time_limit seconds.
+        # Off by default: late in the game one solver node can spend seconds in find_cycle,
+        # so even the time limit can be overrun by that much
+        self.endgame_empty = endgame_empty
+        self.endgame_node_limit = endgame_node_limit
+        self.endgame_time_limit = endgame_time_limit
+        self.endgame_nodes = 0
+        self.endgame_deadline = None
+        # caches keyed by symmetry-canonical position, fixed size from memory_budget_mb
+        # (3/4 transpositions, 1/4 endgame results)
+        # (allocated on the first move, so idle players cost nothing)
+        self.use_tt = use_tt
+        self.memory_budget_mb = memory_budget_mb
+        self.tt_policy = tt_policy
+        self.tt = None
+        self.endgame_cache = None
+        # trace_memory: measure peak allocation of every get_move with tracemalloc
+        self.trace_memory = trace_memory
+        self.last_peak_memory = None
+        # time_manager: game clock (timeman.TimeManager); depth is then only the upper limit
+        # of iterative deepening and the search stops on the clock's budget / deadline
+        self.time_manager = time_manager
+        self.timed = False
+        self.last_depth = 0
+        # smp_helpers: extra processes searching the same root (lazy SMP, smp.py) with the
+        # transposition table in shared memory; each helper has its own endgame cache
+        self.smp_helpers = smp_helpers
+        self.smp = None
 
     def evaluate_board(self, game):
+        w = self.weights
         enemy_id = 3 - self.player_id
         score = (
-            game.players[self.player_id].score * 5000
-            - game.players[enemy_id].score * 4000
+            game.players[self.player_id].score * w['my_score']
+            + game.players[enemy_id].score * w['enemy_score']
         )
 
         for r in range(LOGICAL_GRID_SIZE):
@@ -60,19 +169,17 @@ class AIPlayer(Player):
 
                     # shape building (but capped)
                     if my_n == 0:
-                        score -= 50
+                        score += w['my_isolated']
                     elif my_n == 1:
-                        score += 100
+                        score += w['my_one']
                     elif my_n == 2:
-                        score += 200
-                    elif my_n >= 3:
-                        score += 400
-                    else:  # over-clustering penalty
-                        score -= 150
+                        score += w['my_two']
+                    else:
+                        score += w['my_cluster']
 
                     # contact with enemy = good
                     if en_n > 0:
-                        score += 50
+                        score += w['my_contact']
 
                 # ---------- ENEMY DOTS ----------
                 elif cell['owner'] == enemy_id:
@@ -81,16 +188,16 @@ class AIPlayer(Player):
 
                     # enemy cluster is dangerous
                     if en_n >= 3:
-                        score -= 100
+                        score += w['enemy_cluster']
 
                     # PRESSURE HEURISTIC (this is the key)
                     # enemy dot is being surrounded
                     if my_n >= 2 and en_n <= my_n:
-                        score += 200
+                        score += w['pressure']
 
                     # almost trapped enemy
                     if my_n >= 3:
-                        score += 350
+                        score += w['trapped']
 
         # small noise
         score += random.uniform(-4, 4)
@@ -99,140 +206,749 @@ class AIPlayer(Player):
 
     # -------------------- WYBÓR RUCHU --------------------
     def get_move(self, game):
-        possible_moves = [
-            (r, c)
-            for r in range(LOGICAL_GRID_SIZE)
-            for c in range(LOGICAL_GRID_SIZE)
-            if game.grid[r][c]['owner'] == 0 and not game.grid[r][c]['captured']
-        ]
+        clock = self.time_manager
+        if clock is None:
+            return self.measured(self.choose_move, game)
+        clock.start_move()
+        try:
+            return self.measured(self.choose_move, game)
+        finally:
+            clock.end_move()
+
+    def measured(self, search, game):
+        # search(game) with its peak allocation in last_peak_memory when trace_memory is on
+        if not self.trace_memory:
+            return search(game)
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        try:
+            return search(game)
+        finally:
+            self.last_peak_memory = tracemalloc.get_traced_memory()[1] - base
+            if started:
+                tracemalloc.stop()
+
+    def allocate_tables(self):
+        budget = self.memory_budget_mb * 1024 * 1024
+        if self.smp_helpers:
+            import smp  # helper processes are only started when lazy SMP is on
+
+            self.smp = smp.LazySMP(self.smp_helpers, budget * 3 // 4, budget // 4, self.tt_policy)
+            self.tt = self.smp.table
+        else:
+            self.tt = BoundedTable.for_budget(budget * 3 // 4, self.tt_policy)
+        self.endgame_cache = BoundedTable.for_budget(budget // 4, 'depth')
+
+    def close(self):
+        # stops the lazy SMP helpers and frees the shared table
+        if self.smp is not None:
+            self.smp.close()
+            self.smp = None
+
+    def search_settings(self):
+        """Ustawienia przeszukiwania dla pomocnikow lazy SMP (bez tablic i zegara)."""
+        return {
+            'batch_leaves': self.batch_leaves, 'quiescence': self.quiescence,
+            'q_depth': self.q_depth, 'q_node_limit': self.q_node_limit,
+            'use_pvs': self.use_pvs, 'aspiration_window': self.aspiration_window,
+            'endgame_empty': self.endgame_empty, 'endgame_node_limit': self.endgame_node_limit,
+            'endgame_time_limit': self.endgame_time_limit,
+            'tt_policy': self.tt_policy,
+        }
+
+    def legal_moves(self, game):
+        return game.legal_moves()
+
+    def choose_move(self, game):
+        if self.tt is None:
+            self.allocate_tables()
+        possible_moves = self.legal_moves(game)
 
         if not possible_moves:
             return None
-        
-        enemy_id = 3 - self.player_id
-
-        capture_moves = []
-        current_score = game.players[self.player_id].score
-
-        for r, c in possible_moves:
-            snap = game.snapshot()
-            
-            game.grid[r][c]['owner'] = self.player_id
-            game.check_for_cycles_around(r, c)
-            
-            new_score = game.players[self.player_id].score
-            game.restore(snap)
 
-            if new_score > current_score:
-                capture_moves.append(((r, c), new_score))
+        root = game.snapshot()
+        started = self.start_clock(game, possible_moves)
+        try:
+            return self.pick_move(game, possible_moves)
+        except SearchTimeout:
+            # deadline hit before the search (capture simulations, endgame solver)
+            game.restore(root)
+            return self.timeout_move(game, possible_moves)
+        finally:
+            if started:
+                self.stop_clock(game)
+
+    def pick_move(self, game, possible_moves):
+        enemy_id = 3 - self.player_id
 
+        # one threat analysis instead of simulating every empty cell twice;
+        # only the candidate cells are played out to get the exact gain
+        capture_moves = self.capture_moves(game, self.player_id, game.threats.candidates(self.player_id))
         if capture_moves:
-            capture_moves.sort(key=lambda x: x[1], reverse=True)
             return capture_moves[0][0]
 
-        defensive_moves = []
-        current_en_score = game.players[enemy_id].score
-
-        for r, c in possible_moves:
-            snap = game.snapshot()
-
-            game.grid[r][c]['owner'] = enemy_id
-            game.check_for_cycles_around(r, c)
-            
-            if game.players[enemy_id].score > current_en_score:
-                defensive_moves.append(((r, c), game.players[enemy_id].score))
-            game.restore(snap)
-
+        defensive_moves = self.capture_moves(game, enemy_id, game.threats.candidates(enemy_id))
         if defensive_moves:
-            defensive_moves.sort(key=lambda x: x[1], reverse=True)
             return defensive_moves[0][0]
 
+        self.start_endgame_budget()
+        if len(possible_moves) <= self.endgame_empty:
+            solved = self.solve_root(game, possible_moves)
+            if solved is not None:
+                return random.choice(solved[1])
+
         if random.random() < 0.15:
             return random.choice(possible_moves)
 
+        _, best_moves = self.search(game, possible_moves)
+        return random.choice(best_moves) if best_moves else None
+
+    def analyze(self, game):
+        """Pelne przeszukiwanie pozycji bez skrotow i losowosci (analiza wsadowa)."""
+        return self.measured(self.full_search, game)
+
+    def full_search(self, game):
+        if self.tt is None:
+            self.allocate_tables()
+        moves = self.legal_moves(game)
+        if not moves:
+            return {'move': None, 'score': None, 'depth': 0, 'nodes': 0}
+
+        self.start_endgame_budget()
+        solved = None
+        if len(moves) <= self.endgame_empty:
+            solved = self.solve_root(game, moves)
+        if solved is not None:
+            best_score, best_moves = solved
+            depth = len(moves)
+        else:
+            best_score, best_moves = self.search(game, moves)
+            depth = self.last_depth
+        return {'move': best_moves[0], 'score': best_score, 'depth': depth, 'nodes': self.nodes}
+
+    def search(self, game, possible_moves):
+        """(najlepszy wynik, najlepsze ruchy) z przeszukiwania na glebokosc self.depth."""
+        if self.smp is None:
+            return self.deepen(game, possible_moves)
+
+        self.smp.start(self, game, possible_moves)
+        try:
+            best_score, best_moves = self.deepen(game, possible_moves)
+        finally:
+            helpers = self.smp.stop()
+        # a helper that completed a deeper iteration than the main search knows more
+        for depth, score, moves in helpers:
+            if depth > self.last_depth:
+                self.last_depth, best_score, best_moves = depth, score, moves
+        return best_score, best_moves
+
+    def deepen(self, game, possible_moves):
+        self.q_nodes = 0
+        self.nodes = 0
+        self.last_depth = 0
+        clock = self.time_manager
+
+        if not self.aspiration_window and clock is None:
+            best_score, best_moves, _ = self.search_root(game, possible_moves, self.depth, float('-inf'), float('inf'))
+            self.last_depth = self.depth
+            return best_score, best_moves
+
+        started = self.start_clock(game, possible_moves)
+
+        # iterative deepening: each iteration orders the moves and centres the window for the next one
+        possible_moves = list(possible_moves)
+        prev_score = None
+        best_moves = []
+        scores = {}
+        try:
+            for depth in range(1, self.depth + 1):
+                possible_moves.sort(key=lambda m: scores.get(m, 0), reverse=True)
+                if prev_score is None or not self.aspiration_window:
+                    alpha, beta = float('-inf'), float('inf')
+                else:
+                    alpha, beta = prev_score - self.aspiration_window, prev_score + self.aspiration_window
+                root = game.snapshot()
+                try:
+                    result = self.search_root(game, possible_moves, depth, alpha, beta)
+                    if result[0] <= alpha or result[0] >= beta:
+                        result = self.search_root(game, possible_moves, depth, float('-inf'), float('inf'))
+                except SearchTimeout:
+                    # the unfinished iteration is dropped, the last complete one decides
+                    game.restore(root)
+                    if not best_moves:
+                        best_score, best_moves = None, [self.timeout_move(game, possible_moves)]
+                    break
+                changed = bool(best_moves) and result[1][0] != best_moves[0]
+                best_score, best_moves, scores = result
+                self.last_depth = depth
+                prev_score = best_score
+                if clock is not None:
+                    if depth == self.depth or not clock.next_iteration(best_score, changed):
+                        break
+        finally:
+            if started:
+                self.stop_clock(game)
+
+        return best_score, best_moves
+
+    def start_clock(self, game, moves):
+        """Plan czasu na ruch i wlaczenie kontroli czasu; False, gdy juz trwa albo nie ma zegara."""
+        clock = self.time_manager
+        if clock is None or self.timed:
+            return False
+        threats = len(game.threats.candidates(1)) + len(game.threats.candidates(2))
+        clock.plan(len(moves), LOGICAL_GRID_SIZE ** 2, threats, self.endgame_empty)
+        self.timed = True
+        # a single find_cycle can run for seconds late in the game, so it polls too
+        game.poll = self.check_time
+        return True
+
+    def stop_clock(self, game):
+        self.timed = False
+        game.poll = None
+
+    def check_time(self):
+        # polled at every node and inside find_cycle
+        if self.time_manager.expired():
+            raise SearchTimeout
+
+    def timeout_move(self, game, moves):
+        """Ruch bez zadnej symulacji, gdy czas minal przed ukonczeniem glebokosci 1.
+
+        A cell where a fence may close (own first, then the opponent's) if
+        there is one, else the first move in root order.
+        """
+        for player_id in (self.player_id, 3 - self.player_id):
+            candidates = game.threats.candidates(player_id)
+            for move in moves:
+                if move in candidates:
+                    return move
+        return moves[0]
+
+    def search_root(self, game, moves, depth, alpha, beta):
+        """(najlepszy wynik, najlepsze ruchy, wyniki wszystkich ruchow) dla okna (alpha, beta)."""
         best_score = float('-inf')
         best_moves = []
+        scores = {}
 
-        for r, c in possible_moves:
+        for r, c in moves:
             snap = game.snapshot()
 
             game.grid[r][c]['owner'] = self.player_id
             game.check_for_cycles_around(r, c)
 
-            score = self.minimax(
-                game,
-                self.depth - 1,
-                float('-inf'),
-                float('inf'),
-                False
-            )
+            if self.use_pvs and best_moves:
+                # scout: only prove the move is no better than the current best
+                a = max(alpha, best_score)
+                score = self.minimax(game, depth - 1, a, a + 1, False)
+                if a < score < beta:
+                    score = self.minimax(game, depth - 1, a, beta, False)
+            else:
+                score = self.minimax(game, depth - 1, alpha, beta, False)
 
             game.restore(snap)
+            scores[(r, c)] = score
 
             if score > best_score:
                 best_score = score
                 best_moves = [(r, c)]
-            elif score == best_score:
+            elif score == best_score and not self.use_pvs:
+                # with PVS a tie is only a bound, not an equal move
                 best_moves.append((r, c))
 
-        return random.choice(best_moves) if best_moves else None
+        return best_score, best_moves, scores
+
+    # -------------------- ANALIZA MULTI-PV --------------------
+    def multipv(self, game, k=3, max_depth=None, stop=None):
+        """Generator (glebokosc, [(ruch, wynik, wariant glowny), ...]) po kazdej iteracji.
+
+        k best root moves with exact scores, best first (k=None: every move).
+        All lines share the transposition table; the variations are collected
+        by the search itself (pv_lines). stop: object with expired()
+        (TimeManager, threading flag) polled at every node; the unfinished
+        iteration is then dropped.
+        """
+        if self.tt is None:
+            self.allocate_tables()
+        moves = self.legal_moves(game)
+        k = k or len(moves)
+        self.start_endgame_budget()
+        scores = {}
+        saved_clock = self.time_manager
+        self.time_manager = stop
+        self.timed = stop is not None
+        if self.timed:
+            game.poll = self.check_time
+        self.pv_lines = {}
+        try:
+            for depth in range(1, (max_depth or self.depth) + 1):
+                if not moves:
+                    return
+                self.q_nodes = 0
+                self.nodes = 0
+                moves.sort(key=lambda m: scores.get(m, 0), reverse=True)
+                root = game.snapshot()
+                try:
+                    scores, pvs = self.multipv_root(game, moves, depth, k)
+                    best = sorted(moves, key=lambda m: scores[m], reverse=True)[:k]
+                    lines = [(m, scores[m], pvs[m]) for m in best]
+                except SearchTimeout:
+                    game.restore(root)
+                    return
+                self.last_depth = depth
+                yield depth, lines
+        finally:
+            self.time_manager = saved_clock
+            self.stop_clock(game)
+            self.pv_lines = None
+
+    def multipv_root(self, game, moves, depth, k):
+        """(wyniki, warianty) ruchow z korzenia: dokladne dla k najlepszych, dla reszty ograniczenia."""
+        scores = {}
+        pvs = {}
+        top = []
+        for r, c in moves:
+            # a move has to beat the k-th best exact score to enter the list
+            alpha = top[k - 1] if len(top) >= k else float('-inf')
+            snap = game.snapshot()
+            game.grid[r][c]['owner'] = self.player_id
+            game.check_for_cycles_around(r, c)
+            score = self.minimax(game, depth - 1, alpha, float('inf'), False)
+            game.restore(snap)
+            scores[(r, c)] = score
+            pvs[(r, c)] = [(r, c)] + self.pv_lines[depth - 1]
+            if score > alpha:
+                top.append(score)
+                top.sort(reverse=True)
+        return scores, pvs
 
     # -------------------- MINIMAX --------------------
     def minimax(self, game, depth, alpha, beta, maximizing):
-        if depth == 0 or game.check_full():
+        self.nodes += 1
+        if self.pv_lines is not None:
+            self.pv_lines[depth] = []
+        if self.timed:
+            self.check_time()
+        if game.check_full():
+            return self.evaluate_board(game)
+        if self.endgame_empty and self.endgame_nodes <= self.endgame_node_limit \
+                and game.count_empty() <= self.endgame_empty:
+            value = self.endgame_value(game, maximizing)
+            if value is not None:
+                return value
+        if depth == 0:
+            if self.quiescence:
+                # every leaf gets the whole budget, so sibling leaves are scored alike
+                self.q_nodes = 0
+                return self.quiesce(game, alpha, beta, maximizing, 0)
             return self.evaluate_board(game)
 
+        if not self.use_tt:
+            return self.search_moves(game, depth, alpha, beta, maximizing)
+
+        key = game.position_key() * 2 + maximizing
+        entry = self.tt.get(key)
+        if entry is not None and entry[0] >= depth:
+            _, value, flag = entry
+            # no exact cutoff while collecting variations: the entry has no line
+            if flag == TT_EXACT and self.pv_lines is None:
+                return value
+            if flag == TT_LOWER and value >= beta:
+                return value
+            if flag == TT_UPPER and value <= alpha:
+                return value
+
+        value = self.search_moves(game, depth, alpha, beta, maximizing)
+
+        if value <= alpha:
+            flag = TT_UPPER
+        elif value >= beta:
+            flag = TT_LOWER
+        else:
+            flag = TT_EXACT
+        self.tt.store(key, depth, value, flag)
+        return value
+
+    def search_moves(self, game, depth, alpha, beta, maximizing):
         enemy_id = 3 - self.player_id
 
+        if depth == 1 and self.batch_leaves and not self.quiescence:
+            return self.evaluate_leaves(game, maximizing)
+
         if maximizing:
             max_eval = float('-inf')
-            for r in range(LOGICAL_GRID_SIZE):
-                for c in range(LOGICAL_GRID_SIZE):
-                    if game.grid[r][c]['owner'] == 0 and not game.grid[r][c]['captured']:
-                        snap = game.snapshot()
+            for r, c in game.legal_moves():
+                snap = game.snapshot()
 
-                        game.grid[r][c]['owner'] = self.player_id  # or enemy_id
-                        game.check_for_cycles_around(r, c)
+                game.grid[r][c]['owner'] = self.player_id  # or enemy_id
+                game.check_for_cycles_around(r, c)
 
+                if self.use_pvs and max_eval > float('-inf'):
+                    eval = self.minimax(game, depth - 1, alpha, alpha + 1, not maximizing)
+                    if alpha < eval < beta:
                         eval = self.minimax(game, depth - 1, alpha, beta, not maximizing)
-
-                        game.restore(snap)
-                        max_eval = max(max_eval, eval)
-                        alpha = max(alpha, eval)
-                        if beta <= alpha:
-                            return max_eval
+                else:
+                    eval = self.minimax(game, depth - 1, alpha, beta, not maximizing)
+
+                game.restore(snap)
+                if self.pv_lines is not None and eval > max_eval:
+                    self.pv_lines[depth] = [(r, c)] + self.pv_lines[depth - 1]
+                max_eval = max(max_eval, eval)
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    return max_eval
             return max_eval
         else:
             min_eval = float('inf')
-            for r in range(LOGICAL_GRID_SIZE):
-                for c in range(LOGICAL_GRID_SIZE):
-                    if game.grid[r][c]['owner'] == 0 and not game.grid[r][c]['captured']:
-                        snap = game.snapshot()
+            for r, c in game.legal_moves():
+                snap = game.snapshot()
 
-                        game.grid[r][c]['owner'] = enemy_id
-                        game.check_for_cycles_around(r, c)
+                game.grid[r][c]['owner'] = enemy_id
+                game.check_for_cycles_around(r, c)
 
+                if self.use_pvs and min_eval < float('inf'):
+                    eval = self.minimax(game, depth - 1, beta - 1, beta, not maximizing)
+                    if alpha < eval < beta:
                         eval = self.minimax(game, depth - 1, alpha, beta, not maximizing)
-
-                        game.restore(snap)
-                        min_eval = min(min_eval, eval)
-                        beta = min(beta, eval)
-                        if beta <= alpha:
-                            return min_eval
+                else:
+                    eval = self.minimax(game, depth - 1, alpha, beta, not maximizing)
+
+                game.restore(snap)
+                if self.pv_lines is not None and eval < min_eval:
+                    self.pv_lines[depth] = [(r, c)] + self.pv_lines[depth - 1]
+                min_eval = min(min_eval, eval)
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    return min_eval
             return min_eval
 
+    # -------------------- KONCOWKA --------------------
+    def start_endgame_budget(self):
+        self.endgame_nodes = 0
+        self.endgame_deadline = time.perf_counter() + self.endgame_time_limit if self.endgame_time_limit else None
+
+    def solve(self, game, mover_id):
+        """(punkty movera, punkty przeciwnika) zdobyte do konca gry przy najlepszym bilansie."""
+        key = game.position_key() * 2 + (mover_id - 1)
+        cached = self.endgame_cache.get(key)
+        if cached is not None:
+            return cached[1], cached[2]
+
+        enemy_id = 3 - mover_id
+        best = None
+        moves = 0
+        for r, c in game.legal_moves():
+            self.nodes += 1
+            if self.timed:
+                self.check_time()
+            moves += 1
+            self.endgame_nodes += 1
+            if self.endgame_deadline is not None and time.perf_counter() > self.endgame_deadline:
+                # out of time: closes the solver for the rest of the move, like the node limit
+                self.endgame_nodes = self.endgame_node_limit + 1
+            if self.endgame_nodes > self.endgame_node_limit:
+                raise EndgameAbort
+            mover_before = game.players[mover_id].score
+            enemy_before = game.players[enemy_id].score
+            snap = game.snapshot()
+
+            game.grid[r][c]['owner'] = mover_id
+            game.check_for_cycles_around(r, c)
+
+            enemy_later, mover_later = self.solve(game, enemy_id)
+            value = (game.players[mover_id].score - mover_before + mover_later,
+                     game.players[enemy_id].score - enemy_before + enemy_later)
+            game.restore(snap)
+            if best is None or value[0] - value[1] > best[0] - best[1]:
+                best = value
+        if best is None:
+            best = (0, 0)
+
+        # bigger subtrees are worth more, so the move count is the entry's depth
+        self.endgame_cache.store(key, moves, *best)
+        return best
+
+    def endgame_value(self, game, maximizing):
+        """Dokladny wynik koncowy w skali oceny albo None, gdy skonczyl sie limit wezlow."""
+        enemy_id = 3 - self.player_id
+        snap = game.snapshot()
+        try:
+            if maximizing:
+                my_gain, enemy_gain = self.solve(game, self.player_id)
+            else:
+                enemy_gain, my_gain = self.solve(game, enemy_id)
+        except EndgameAbort:
+            # finished subtrees stay cached; this node falls back to the heuristic search
+            game.restore(snap)
+            return None
+        # the final scores weighted like the score terms of evaluate_board
+        w = self.weights
+        return ((game.players[self.player_id].score + my_gain) * w['my_score']
+                + (game.players[enemy_id].score + enemy_gain) * w['enemy_score'])
+
+    def solve_root(self, game, moves):
+        """(wynik, najlepsze ruchy) z dokladnego rozwiazania albo None po przekroczeniu limitu."""
+        self.nodes = 0
+        best_value = None
+        best_moves = []
+        for r, c in moves:
+            snap = game.snapshot()
+
+            game.grid[r][c]['owner'] = self.player_id
+            game.check_for_cycles_around(r, c)
+
+            value = self.endgame_value(game, False)
+            game.restore(snap)
+            if value is None:
+                return None
+
+            if best_value is None or value > best_value:
+                best_value = value
+                best_moves = [(r, c)]
+            elif value == best_value:
+                best_moves.append((r, c))
+        return best_value, best_moves
+
+    # -------------------- QUIESCENCE --------------------
+    def capture_moves(self, game, player_id, candidates=None):
+        """Ruchy, ktorymi player_id od razu zdobywa punkty: [((r, c), zysk), ...]."""
+        if candidates is None:
+            candidates = capture_candidates(game, player_id)
+        result = []
+        current_score = game.players[player_id].score
+        for r, c in sorted(candidates):
+            if self.timed:
+                self.check_time()
+            self.q_nodes += 1  # every simulation counts against the quiescence budget
+            snap = game.snapshot()
+            game.grid[r][c]['owner'] = player_id
+            game.check_for_cycles_around(r, c)
+            gain = game.players[player_id].score - current_score
+            game.restore(snap)
+            if gain > 0:
+                result.append(((r, c), gain))
+        result.sort(key=lambda x: x[1], reverse=True)
+        return result
+
+    def tactical_moves(self, game, player_id):
+        # own captures first, then the cells where the opponent would capture
+        moves = [move for move, _ in self.capture_moves(game, player_id)]
+        for move, _ in self.capture_moves(game, 3 - player_id):
+            if move not in moves:
+                moves.append(move)
+        return moves
+
+    def quiesce(self, game, alpha, beta, maximizing, qdepth):
+        if self.timed:
+            self.check_time()
+        stand_pat = self.evaluate_board(game)
+        if qdepth >= self.q_depth or self.q_nodes >= self.q_node_limit or game.check_full():
+            return stand_pat
+
+        if maximizing:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+
+        mover_id = self.player_id if maximizing else 3 - self.player_id
+        best = stand_pat
+        for r, c in self.tactical_moves(game, mover_id):
+            if self.q_nodes >= self.q_node_limit:
+                break
+            self.q_nodes += 1
+            snap = game.snapshot()
+            game.grid[r][c]['owner'] = mover_id
+            game.check_for_cycles_around(r, c)
+            eval = self.quiesce(game, alpha, beta, not maximizing, qdepth + 1)
+            game.restore(snap)
+
+            if maximizing:
+                best = max(best, eval)
+                alpha = max(alpha, eval)
+            else:
+                best = min(best, eval)
+                beta = min(beta, eval)
+            if beta <= alpha:
+                break
+        return best
+
+    def evaluate_leaves(self, game, maximizing):
+        # all children of this node scored in one vectorized pass (no cutoffs on the last ply)
+        import batch_eval  # numpy is only needed when batch_leaves is on
+
+        mover_id = self.player_id if maximizing else 3 - self.player_id
+        moves, owners, captured, my_scores, en_scores = batch_eval.gather_children(game, mover_id, self.player_id)
+        scores = batch_eval.evaluate_batch(owners, captured, my_scores, en_scores, self.player_id,
+                                           batch_eval.weight_vector(self.weights))
+        return float(scores.max() if maximizing else scores.min())
+
+# -------------------- ANALIZA W TLE --------------------
+class StopFlag(threading.Event):
+    def expired(self):
+        return self.is_set()
+
+
+class BackgroundAnalysis:
+    """Analiza multi-PV pozycji z gry w osobnym watku (nakladka z mapa ciepla).
+
+    The thread works on its own headless copy of the position and only
+    publishes finished iterations, so drawing never waits for the search.
+    A new position stops the running analysis without waiting for it: the
+    flag is polled at every node and inside find_cycle, so the old thread
+    exits soon after, and its late results are ignored. Nothing runs while
+    an AI is to move, its synchronous get_move would compete for the GIL.
+    The AIPlayers of a side keep their transposition tables from move to
+    move; an engine is handed to a new thread only once its old one is
+    done, and a side has at most ENGINES_PER_SIDE of them. When all are
+    still busy the new position waits for the next update.
+    """
+
+    ENGINES_PER_SIDE = 2
+
+    def __init__(self, depth=3, k=None):
+        self.depth = depth
+        self.k = k
+        self.engines = {}           # gracz -> [(AIPlayer, watek, ktory go uzywa)]
+        self.lock = threading.Lock()
+        self.result = None          # (pozycja, glebokosc, linie)
+        self.position = None
+        self.stop = None
+
+    def update(self, game):
+        position = (len(game.history), game.turn, game.game_over)
+        if position == self.position:
+            return
+        self.cancel()
+        idle = game.game_over or game.players[game.turn].is_ai
+        engines = self.engines.setdefault(game.turn, [])
+        slot = None if idle else self.engine(game.turn, engines)
+        if slot is None and not idle:
+            # every engine of this side is still winding down, retry on the next update
+            return
+        with self.lock:
+            self.position = position
+            self.result = None
+        if idle:
+            return
+        self.stop = StopFlag()
+        ai = engines[slot][0]
+        thread = threading.Thread(
+            target=self.work, args=(ai, game.export_state(), position, self.stop), daemon=True)
+        engines[slot] = (ai, thread)
+        thread.start()
+
+    def engine(self, player_id, engines):
+        """Indeks wolnego silnika strony (nowy, jesli limit pozwala), None gdy brak."""
+        for i, (_, thread) in enumerate(engines):
+            if not thread.is_alive():
+                return i
+        if len(engines) >= self.ENGINES_PER_SIDE:
+            return None
+        ai = AIPlayer(player_id, RED if player_id == 2 else BLUE, "Analiza",
+                      depth=self.depth, memory_budget_mb=16)
+        engines.append((ai, None))
+        return len(engines) - 1
+
+    def work(self, ai, state, position, stop):
+        game = KropkiGame(headless=True)
+        game.load_state(state)
+        for depth, lines in ai.multipv(game, self.k, stop=stop):
+            with self.lock:
+                if position != self.position:
+                    return
+                self.result = (position, depth, lines)
+
+    def latest(self):
+        with self.lock:
+            if self.result is None or self.result[0] != self.position:
+                return None
+            return self.result[1], self.result[2]
+
+    def cancel(self):
+        # only signals the thread; it is a daemon, so it never holds up exit
+        if self.stop is not None:
+            self.stop.set()
+            self.stop = None
+        with self.lock:
+            self.position = None
+
+
+# -------------------- RYSOWANIE PLANSZY --------------------
+# shared by KropkiGame.draw_game and render.py; origin is the pixel of point (0, 0)
+def board_point(origin, r, c):
+    return (origin[0] + c*CELL_MARGIN, origin[1] + r*CELL_MARGIN)
+
+
+def draw_grid(surface, origin):
+    last = (LOGICAL_GRID_SIZE-1)*CELL_MARGIN
+    for i in range(LOGICAL_GRID_SIZE):
+        x, y = board_point(origin, i, i)
+        pygame.draw.line(surface, LINE_COLOR, (origin[0], y), (origin[0] + last, y))
+        pygame.draw.line(surface, LINE_COLOR, (x, origin[1]), (x, origin[1] + last))
+
+
+def draw_pieces(surface, game, origin):
+    """Plotki, kropki (zbite wyblakle), ostatni ruch i zajete puste pola."""
+    all_fence_points = set()
+    for area, _ in game.captured_areas:
+        for p in area: all_fence_points.add(p)
+
+    for area, player_id in game.captured_areas:
+        color = game.players[player_id].color
+        points = [board_point(origin, r, c) for r, c in area]
+        pygame.draw.lines(surface, color, True, points, 3)
+
+    for r in range(LOGICAL_GRID_SIZE):
+        for c in range(LOGICAL_GRID_SIZE):
+            owner_id = game.grid[r][c]['owner']
+            pos = board_point(origin, r, c)
+            if owner_id != 0:
+                if game.grid[r][c]['captured'] and (r, c) not in all_fence_points:
+                    orig_color = game.players[owner_id].color
+                    color = tuple(min(255, x + 160) for x in orig_color)
+                else:
+                    color = game.players[owner_id].color
+                pygame.draw.circle(surface, color, pos, DOT_RADIUS)
+                if game.last_move == (r, c):
+                    pygame.draw.circle(surface, LAST_MOVE_COLOR, pos, DOT_RADIUS + 2, 2)
+            elif game.grid[r][c]['captured']:
+                pygame.draw.circle(surface, CAPTURED_EMPTY_COLOR, pos, 2)
+
+
 class KropkiGame:
-    def __init__(self):
-        pygame.init()
-        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
-        pygame.display.set_caption("Kropki z Implementacja AI")
-        self.font = pygame.font.SysFont("Arial", 22, bold=True)
-        self.turn_font = pygame.font.SysFont("Arial", 20, bold=True)
-        self.end_font = pygame.font.SysFont("Arial", 40, bold=True)
+    def __init__(self, headless=False, telemetry=None):
+        # headless: same rules without a window (server, workers, batch tools)
+        # telemetry: frame / think time histograms (telemetry.py), off by default
+        self.telemetry = telemetry if telemetry is not None else DISABLED
+        self.screen = None
+        if not headless:
+            pygame.init()
+            self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+            pygame.display.set_caption("Kropki z Implementacja AI")
+            self.font = pygame.font.SysFont("Arial", 22, bold=True)
+            self.turn_font = pygame.font.SysFont("Arial", 20, bold=True)
+            self.end_font = pygame.font.SysFont("Arial", 40, bold=True)
+            self.small_font = pygame.font.SysFont("Arial", 14, bold=True)
 
         self.grid = [[{'owner': 0, 'captured': False} for _ in range(LOGICAL_GRID_SIZE)] for _ in range(LOGICAL_GRID_SIZE)]
         self.captured_areas = []
         self.last_move = None
+        # moves played with make_move, in order (game record for replays / render.py)
+        self.history = []
+        self.chains = ChainSets()
+        self.sym_hash = SymmetryHash(LOGICAL_GRID_SIZE)
+        # empty, uncaptured cells = legal moves; empty_log lists removed cells for restore()
+        self.empty = {(r, c) for r in range(LOGICAL_GRID_SIZE) for c in range(LOGICAL_GRID_SIZE)}
+        self.empty_log = []
 
         self.player1 = Player(1, BLUE, "Niebieski")
         self.player2 = AIPlayer(2, RED, "Czerwony")
@@ -241,6 +957,12 @@ class KropkiGame:
         self.turn = 1
         self.running = True
         self.game_over = False
+        self.threats = ThreatMap(self)
+        # analysis: BackgroundAnalysis behind the heatmap overlay (key H), None = off
+        self.analysis = None
+        # poll: called every POLL_STEPS steps of find_cycle (the AI's deadline check
+        # while it searches on this game; it may raise SearchTimeout), None = off
+        self.poll = None
 
     def get_neighbors(self, r, c, player_id):
         neighbors = []
@@ -253,7 +975,11 @@ class KropkiGame:
 
     def find_cycle(self, start_node, player_id):
         stack = [(start_node, [start_node])]
+        steps = 0
         while stack:
+            steps += 1
+            if self.poll is not None and steps % POLL_STEPS == 0:
+                self.poll()
             (curr_r, curr_c), path = stack.pop()
             for neighbor in self.get_neighbors(curr_r, curr_c, player_id):
                 if len(path) >= 4 and neighbor == start_node:
@@ -298,6 +1024,11 @@ class KropkiGame:
                         if self.grid[r][c]['owner'] == enemy_id:
                             captured_count += 1
                         self.grid[r][c]['captured'] = True
+                        owner = self.grid[r][c]['owner']
+                        self.sym_hash.change(r, c, owner * 2, owner * 2 + 1)
+                        if owner == 0:
+                            self.empty.discard((r, c))
+                            self.empty_log.append((r, c))
         return captured_count
 
     def is_point_in_poly(self, r, c, poly):
@@ -316,61 +1047,73 @@ class KropkiGame:
 
     def check_for_cycles_around(self, r, c):
         owner_of_last_move = self.grid[r][c]['owner']
-        cycle = self.find_cycle((r, c), owner_of_last_move)
-        if cycle:
-            self.captured_areas.append((cycle, owner_of_last_move))
+        self.sym_hash.toggle(r, c, owner_of_last_move * 2)
+        self.empty.discard((r, c))
+        self.empty_log.append((r, c))
+        # a new fence needs the dot to touch the same chain twice
+        # and an enemy dot that no longer reaches the board edge
+        closes = self.chains.add((r, c), self.get_neighbors(r, c, owner_of_last_move))
+        if closes and encloses_enemy(self.grid, owner_of_last_move):
+            cycle = self.find_cycle((r, c), owner_of_last_move)
+            if cycle:
+                self.captured_areas.append((cycle, owner_of_last_move))
         
         enemy_id = 3 - owner_of_last_move
+        enemy_encloses = None
         for dr in range(-1, 2):
             for dc in range(-1, 2):
                 nr, nc = r + dr, c + dc
                 if 0 <= nr < LOGICAL_GRID_SIZE and 0 <= nc < LOGICAL_GRID_SIZE:
-                    if self.grid[nr][nc]['owner'] == enemy_id and not self.grid[nr][nc]['captured']:
+                    # only an enemy chain that already has a loop can enclose the new dot
+                    if self.grid[nr][nc]['owner'] == enemy_id and not self.grid[nr][nc]['captured'] \
+                            and self.chains.has_loop((nr, nc)):
+                        if enemy_encloses is None:
+                            enemy_encloses = encloses_enemy(self.grid, enemy_id)
+                        if not enemy_encloses:
+                            continue
                         cycle = self.find_cycle((nr, nc), enemy_id)
                         if cycle:
                             self.captured_areas.append((cycle, enemy_id))
 
+    def count_empty(self):
+        return len(self.empty)
+
+    def legal_moves(self):
+        # sorted: the same row-major order the full-grid scans used to give
+        return sorted(self.empty)
+
+    def position_key(self):
+        # the same key for all 8 rotations/reflections of the position
+        return self.sym_hash.key()
+
     def check_full(self):
-        for r in range(LOGICAL_GRID_SIZE):
-            for c in range(LOGICAL_GRID_SIZE):
-                if self.grid[r][c]['owner'] == 0 and not self.grid[r][c]['captured']:
-                    return False
-        return True
+        return not self.empty
 
     def draw_game(self):
         self.screen.fill(BG_COLOR)
-        for i in range(LOGICAL_GRID_SIZE):
-            pygame.draw.line(self.screen, LINE_COLOR, 
-                             (CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + i*CELL_MARGIN + OFFSET), 
-                             (CELL_MARGIN + (LOGICAL_GRID_SIZE-1)*CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + i*CELL_MARGIN + OFFSET))
-            pygame.draw.line(self.screen, LINE_COLOR, 
-                             (CELL_MARGIN + i*CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + OFFSET), 
-                             (CELL_MARGIN + i*CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + (LOGICAL_GRID_SIZE-1)*CELL_MARGIN + OFFSET))
-
-        all_fence_points = set()
-        for area, _ in self.captured_areas:
-            for p in area: all_fence_points.add(p)
-
-        for area, player_id in self.captured_areas:
-            color = self.players[player_id].color
-            points = [(CELL_MARGIN + c*CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + r*CELL_MARGIN + OFFSET) for r, c in area]
-            pygame.draw.lines(self.screen, color, True, points, 3)
-
-        for r in range(LOGICAL_GRID_SIZE):
-            for c in range(LOGICAL_GRID_SIZE):
-                owner_id = self.grid[r][c]['owner']
-                pos = (CELL_MARGIN + c*CELL_MARGIN + OFFSET, UI_HEIGHT + CELL_MARGIN + r*CELL_MARGIN + OFFSET)
-                if owner_id != 0:
-                    if self.grid[r][c]['captured'] and (r, c) not in all_fence_points:
-                        orig_color = self.players[owner_id].color
-                        color = tuple(min(255, x + 160) for x in orig_color)
-                    else:
-                        color = self.players[owner_id].color
-                    pygame.draw.circle(self.screen, color, pos, DOT_RADIUS)
-                    if self.last_move == (r, c):
-                        pygame.draw.circle(self.screen, LAST_MOVE_COLOR, pos, DOT_RADIUS + 2, 2)
-                elif self.grid[r][c]['captured']:
-                    pygame.draw.circle(self.screen, (200, 200, 180), pos, 2)
+        draw_grid(self.screen, BOARD_ORIGIN)
+        draw_pieces(self.screen, self, BOARD_ORIGIN)
+
+    def draw_heatmap(self):
+        # legal moves coloured from the worst (red) to the best (green) score, top 3 numbered
+        result = self.analysis.latest()
+        if not result:
+            return
+        depth, lines = result
+        values = [score for _, score, _ in lines]
+        low, high = min(values), max(values)
+        size = CELL_MARGIN - 8
+        overlay = pygame.Surface((size, size), pygame.SRCALPHA)
+        for rank, ((r, c), score, _) in enumerate(lines):
+            t = (score - low) / (high - low) if high > low else 1.0
+            overlay.fill((int(255 * (1 - t)), int(190 * t), 60, HEATMAP_ALPHA))
+            x, y = board_point(BOARD_ORIGIN, r, c)
+            self.screen.blit(overlay, (x - size // 2, y - size // 2))
+            if rank < 3:
+                label = self.small_font.render(str(rank + 1), True, GRAY)
+                self.screen.blit(label, label.get_rect(center=(x, y)))
+        info = self.small_font.render(f"analiza: glebokosc {depth}", True, GRAY)
+        self.screen.blit(info, (20, HEIGHT - 22))
 
     def draw_ui(self):
         pygame.draw.rect(self.screen, TEXT_BG, (0, 0, WIDTH, UI_HEIGHT))
@@ -396,14 +1139,23 @@ class KropkiGame:
         if self.grid[row][col]['owner'] == 0 and not self.grid[row][col]['captured']:
             self.grid[row][col]['owner'] = self.turn
             self.last_move = (row, col)
+            self.history.append((row, col))
             
             self.check_for_cycles_around(row, col)
+            self.threats.update(row, col)
             
             if self.check_full(): self.game_over = True
             else: self.turn = 3 - self.turn
             return True
         return False
 
+    def toggle_analysis(self):
+        if self.analysis is None:
+            self.analysis = BackgroundAnalysis()
+        else:
+            self.analysis.cancel()
+            self.analysis = None
+
     def handle_click(self, pos):
         if self.game_over: return
         x, y = pos
@@ -413,37 +1165,106 @@ class KropkiGame:
             self.make_move(row, col)
 
     def snapshot(self):
+        # captured_areas only grows during the search, so its length is enough
         return (
         [[cell.copy() for cell in row] for row in self.grid],
         self.player1.score,
         self.player2.score,
-        list(self.captured_areas)
+        len(self.captured_areas),
+        self.chains.mark(),
+        list(self.sym_hash.hashes),
+        len(self.empty_log)
     )
 
     def restore(self, snap):
-        grid, s1, s2, captured = snap
-        self.grid = [[cell.copy() for cell in row] for row in grid]
+        # the snapshot's grid is taken over, not copied: restore each snapshot once
+        grid, s1, s2, areas, chains_mark, hashes, empty_mark = snap
+        self.grid = grid
         self.player1.score = s1
         self.player2.score = s2
-        self.captured_areas = list(captured)
+        del self.captured_areas[areas:]
+        self.chains.undo(chains_mark)
+        self.sym_hash.hashes = hashes
+        while len(self.empty_log) > empty_mark:
+            self.empty.add(self.empty_log.pop())
+
+    def export_state(self):
+        # plain, JSON-friendly copy of the position (for sockets and worker processes)
+        return {
+            'size': LOGICAL_GRID_SIZE,
+            'owners': [[cell['owner'] for cell in row] for row in self.grid],
+            'captured': [[int(cell['captured']) for cell in row] for row in self.grid],
+            'areas': [[[list(p) for p in area], player_id] for area, player_id in self.captured_areas],
+            'scores': [self.player1.score, self.player2.score],
+            'turn': self.turn,
+            'last_move': list(self.last_move) if self.last_move else None,
+            'game_over': self.game_over,
+        }
+
+    def load_state(self, state):
+        if state['size'] != LOGICAL_GRID_SIZE:
+            raise ValueError(f"board size {state['size']} != {LOGICAL_GRID_SIZE}")
+        self.grid = [
+            [{'owner': owner, 'captured': bool(cap)} for owner, cap in zip(owners, captured)]
+            for owners, captured in zip(state['owners'], state['captured'])
+        ]
+        self.captured_areas = [([tuple(p) for p in area], player_id) for area, player_id in state['areas']]
+        self.player1.score, self.player2.score = state['scores']
+        self.turn = state['turn']
+        self.last_move = tuple(state['last_move']) if state['last_move'] else None
+        self.game_over = state['game_over']
+        self.history = []
+        self.chains = ChainSets()
+        for r in range(LOGICAL_GRID_SIZE):
+            for c in range(LOGICAL_GRID_SIZE):
+                owner = self.grid[r][c]['owner']
+                if owner != 0 and not self.grid[r][c]['captured']:
+                    self.chains.add((r, c), self.get_neighbors(r, c, owner))
+        self.sym_hash.rebuild(self.grid)
+        self.empty = {
+            (r, c) for r in range(LOGICAL_GRID_SIZE) for c in range(LOGICAL_GRID_SIZE)
+            if self.grid[r][c]['owner'] == 0 and not self.grid[r][c]['captured']
+        }
+        self.empty_log = []
+        self.threats.refresh()
 
     def run(self):
+        metrics = self.telemetry
+        last_events = time.perf_counter()
         while self.running:
-            self.draw_game()
-            self.draw_ui()
+            with metrics.timer('draw_game'):
+                self.draw_game()
+            if self.analysis is not None:
+                self.analysis.update(self)
+                self.draw_heatmap()
+            with metrics.timer('draw_ui'):
+                self.draw_ui()
             #turn off
             if not self.game_over and self.players[self.turn].is_ai:
-                pygame.display.flip()
-                move = self.players[self.turn].get_move(self)
+                with metrics.timer('flip'):
+                    pygame.display.flip()
+                with metrics.timer('ai_think'):
+                    move = self.players[self.turn].get_move(self)
                 if move:
                     self.make_move(move[0], move[1])
             #till here
+            # time since the last event poll: how long the window did not react
+            now = time.perf_counter()
+            metrics.observe('event_loop', now - last_events)
+            last_events = now
             for event in pygame.event.get():
                 if event.type == pygame.QUIT: self.running = False
                 if event.type == pygame.MOUSEBUTTONDOWN: self.handle_click(pygame.mouse.get_pos())
-            pygame.display.flip()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F12: metrics.write()
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_h: self.toggle_analysis()
+            with metrics.timer('flip'):
+                pygame.display.flip()
+            metrics.tick()
+        if self.analysis is not None:
+            self.analysis.cancel()
+        metrics.close()
         pygame.quit()
 
 if __name__ == "__main__":
-    game = KropkiGame()
+    game = KropkiGame(telemetry=from_env())
     game.run()
@@ -0,0 +1,192 @@
+"""Trwala (niezmienna) plansza: ruch zwraca nowa plansze, stara zostaje bez zmian.
+
+Rows are tuples of cell codes (``owner * 2 + captured``, as in
+symmetry.py) and the board is a tuple of rows, so a move copies only the
+rows it changes and shares every other row with its parent. Fences are a
+linked list that shares its tail, and the 8 symmetry hashes, scores and
+the number of empty cells are carried along. Keeping a fork of a
+position costs the changed rows, not a copy of the grid; MCTS trees,
+analysis lines and takeback can hold thousands of them.
+
+The capture rules are not written twice: when a move could close a fence
+(two own neighbours) or be caught in one (an enemy neighbour),
+``KropkiGame.check_for_cycles_around`` runs on a ``RulesView``, a
+throwaway game-like object built from the board. Any other move is
+placed directly.
+"""
+from types import SimpleNamespace
+
+from last_min import KropkiGame, LOGICAL_GRID_SIZE
+from symmetry import SymmetryHash
+
+NEIGHBORS = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+class AnyChains:
+    """Zastepuje ChainSets: bez historii lancuchow przepuszcza kazdy mozliwy obwod.
+
+    ``add`` is True whenever the dot touches two own dots, ``has_loop``
+    always; find_cycle then decides, so captures are the same as with the
+    exact gate, only searched a bit more often.
+    """
+
+    def add(self, p, neighbors):
+        return len(neighbors) >= 2
+
+    def has_loop(self, p):
+        return True
+
+
+class RulesView:
+    """Obiekt z atrybutami KropkiGame potrzebnymi regulom zbijania."""
+
+    get_neighbors = KropkiGame.get_neighbors
+    find_cycle = KropkiGame.find_cycle
+    is_cycle_already_captured = KropkiGame.is_cycle_already_captured
+    validate_and_capture = KropkiGame.validate_and_capture
+    is_point_in_poly = KropkiGame.is_point_in_poly
+    check_for_cycles_around = KropkiGame.check_for_cycles_around
+    poll = None
+
+    def __init__(self, board):
+        self.grid = [
+            [{'owner': code >> 1, 'captured': bool(code & 1)} for code in row]
+            for row in board.rows
+        ]
+        self.captured_areas = board.areas()
+        self.players = {1: SimpleNamespace(score=board.scores[0]), 2: SimpleNamespace(score=board.scores[1])}
+        self.chains = AnyChains()
+        self.sym_hash = SymmetryHash(board.size)
+        self.sym_hash.hashes = list(board.hashes)
+        self.empty = set()
+        self.empty_log = []
+
+
+class Board:
+    __slots__ = ('size', 'rows', 'fences', 'scores', 'turn', 'last_move', 'hashes', 'empty_count')
+
+    def __init__(self, size, rows, fences, scores, turn, last_move, hashes, empty_count):
+        self.size = size
+        self.rows = rows
+        self.fences = fences            # (area, player_id, rest) or None, newest first
+        self.scores = scores
+        self.turn = turn
+        self.last_move = last_move
+        self.hashes = hashes
+        self.empty_count = empty_count
+
+    @classmethod
+    def new(cls, size=LOGICAL_GRID_SIZE):
+        rows = (tuple([0] * size),) * size
+        return cls(size, rows, None, (0, 0), 1, None, (0,) * 8, size * size)
+
+    @classmethod
+    def from_state(cls, state):
+        size = state['size']
+        rows = tuple(
+            tuple(owner * 2 + int(cap) for owner, cap in zip(owners, captured))
+            for owners, captured in zip(state['owners'], state['captured'])
+        )
+        fences = None
+        for area, player_id in state['areas']:
+            fences = ([tuple(p) for p in area], player_id, fences)
+        h = SymmetryHash(size)
+        h.rebuild([[{'owner': code >> 1, 'captured': code & 1} for code in row] for row in rows])
+        empty = sum(row.count(0) for row in rows)
+        last = tuple(state['last_move']) if state.get('last_move') else None
+        return cls(size, rows, fences, tuple(state['scores']), state['turn'], last, tuple(h.hashes), empty)
+
+    @classmethod
+    def from_game(cls, game):
+        return cls.from_state(game.export_state())
+
+    # -------------------- ODCZYT --------------------
+    def owner(self, r, c):
+        return self.rows[r][c] >> 1
+
+    def captured(self, r, c):
+        return bool(self.rows[r][c] & 1)
+
+    def is_full(self):
+        return self.empty_count == 0
+
+    def legal_moves(self):
+        return [(r, c) for r, row in enumerate(self.rows) for c, code in enumerate(row) if code == 0]
+
+    def key(self):
+        # the same key as KropkiGame.position_key() for this position
+        return min(self.hashes)
+
+    def areas(self):
+        result = []
+        node = self.fences
+        while node is not None:
+            area, player_id, node = node
+            result.append((area, player_id))
+        result.reverse()
+        return result
+
+    def to_state(self):
+        return {
+            'size': self.size,
+            'owners': [[code >> 1 for code in row] for row in self.rows],
+            'captured': [[code & 1 for code in row] for row in self.rows],
+            'areas': [[[list(p) for p in area], player_id] for area, player_id in self.areas()],
+            'scores': list(self.scores),
+            'turn': self.turn,
+            'last_move': list(self.last_move) if self.last_move else None,
+            'game_over': self.is_full(),
+        }
+
+    # -------------------- RUCH --------------------
+    def may_capture(self, r, c, player_id):
+        own = 0
+        for dr, dc in NEIGHBORS:
+            nr, nc = r + dr, c + dc
+            if 0 <= nr < self.size and 0 <= nc < self.size:
+                code = self.rows[nr][nc]
+                if code & 1:
+                    continue
+                if code >> 1 == player_id:
+                    own += 1
+                elif code:
+                    return True
+        return own >= 2
+
+    def play(self, r, c):
+        """Nowa plansza po ruchu gracza self.turn na (r, c); ta plansza sie nie zmienia."""
+        if self.rows[r][c] != 0:
+            raise ValueError(f"cell {r},{c} is not empty")
+        player_id = self.turn
+
+        if not self.may_capture(r, c, player_id):
+            row = list(self.rows[r])
+            row[c] = player_id * 2
+            rows = self.rows[:r] + (tuple(row),) + self.rows[r + 1:]
+            h = SymmetryHash(self.size)
+            h.hashes = list(self.hashes)
+            h.toggle(r, c, player_id * 2)
+            return self.child(rows, self.fences, self.scores, (r, c), tuple(h.hashes), self.empty_count - 1)
+
+        view = RulesView(self)
+        known = len(view.captured_areas)
+        view.grid[r][c]['owner'] = player_id
+        view.check_for_cycles_around(r, c)
+
+        rows = list(self.rows)
+        empty = self.empty_count
+        for i, (old, cells) in enumerate(zip(self.rows, view.grid)):
+            new = tuple(cell['owner'] * 2 + cell['captured'] for cell in cells)
+            if new != old:
+                empty -= sum(1 for a, b in zip(old, new) if a == 0 and b != 0)
+                rows[i] = new
+        fences = self.fences
+        for area, owner in view.captured_areas[known:]:
+            fences = (area, owner, fences)
+        scores = (view.players[1].score, view.players[2].score)
+        return self.child(tuple(rows), fences, scores, (r, c), tuple(view.sym_hash.hashes), empty)
+
+    def child(self, rows, fences, scores, last_move, hashes, empty_count):
+        # like make_move: the turn passes unless the board is full
+        turn = self.turn if empty_count == 0 else 3 - self.turn
+        return Board(self.size, rows, fences, scores, turn, last_move, hashes, empty_count)
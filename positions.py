@@ -0,0 +1,139 @@
+"""Tekstowy zapis pozycji Kropek.
+
+One position is a block of lines, blocks are separated by a line ``---``:
+
+    size 7
+    turn 1
+    score 0 2
+    .......
+    ..xo...
+    .xOx...
+    ..xo...
+    .......
+    .......
+    .......
+    fence 1 1,2 2,1 3,2 2,3
+
+Board rows use ``.`` empty, ``x``/``o`` dots of player 1/2, ``X``/``O``
+captured dots and ``+`` a captured empty cell. ``fence`` lines (optional)
+list one closed fence with its owner, ``last r,c`` (optional) marks the
+last move. Lines starting with ``#`` are comments.
+
+Positions are the same dicts as ``KropkiGame.export_state()``.
+"""
+
+CELL_CHARS = {'.': (0, 0), 'x': (1, 0), 'o': (2, 0), '+': (0, 1), 'X': (1, 1), 'O': (2, 1)}
+CHAR_OF = {v: k for k, v in CELL_CHARS.items()}
+SEPARATOR = '---'
+
+
+def format_position(state):
+    lines = [f"size {state['size']}", f"turn {state['turn']}", f"score {state['scores'][0]} {state['scores'][1]}"]
+    for owners, captured in zip(state['owners'], state['captured']):
+        lines.append(''.join(CHAR_OF[(owner, int(cap))] for owner, cap in zip(owners, captured)))
+    for area, player_id in state['areas']:
+        lines.append(f"fence {player_id} " + ' '.join(f"{r},{c}" for r, c in area))
+    if state.get('last_move'):
+        lines.append("last {},{}".format(*state['last_move']))
+    return '\n'.join(lines) + '\n'
+
+
+def parse_point(text, line_no):
+    try:
+        r, c = text.split(',')
+        return [int(r), int(c)]
+    except ValueError:
+        raise ValueError(f"line {line_no}: bad point {text!r}")
+
+
+def parse_position(lines, first_line=1):
+    """Pozycja z listy linii (bez separatorow); first_line tylko do komunikatow bledow."""
+    state = {'areas': [], 'last_move': None, 'owners': [], 'captured': []}
+    size = None
+    for i, line in enumerate(lines, first_line):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        word, _, rest = line.partition(' ')
+        if word == 'size':
+            size = int(rest)
+        elif word == 'turn':
+            state['turn'] = int(rest)
+            if state['turn'] not in (1, 2):
+                raise ValueError(f"line {i}: turn must be 1 or 2")
+        elif word == 'score':
+            state['scores'] = [int(x) for x in rest.split()]
+            if len(state['scores']) != 2:
+                raise ValueError(f"line {i}: score needs two numbers")
+        elif word == 'fence':
+            parts = rest.split()
+            if len(parts) < 5:
+                raise ValueError(f"line {i}: fence needs an owner and at least 4 points")
+            state['areas'].append([[parse_point(p, i) for p in parts[1:]], int(parts[0])])
+        elif word == 'last':
+            state['last_move'] = parse_point(rest, i)
+        elif set(line) <= set(CELL_CHARS):
+            row = [CELL_CHARS[ch] for ch in line]
+            state['owners'].append([owner for owner, _ in row])
+            state['captured'].append([cap for _, cap in row])
+        else:
+            raise ValueError(f"line {i}: cannot parse {line!r}")
+
+    if size is None or 'turn' not in state:
+        raise ValueError(f"position at line {first_line}: size and turn are required")
+    if len(state['owners']) != size or any(len(row) != size for row in state['owners']):
+        raise ValueError(f"position at line {first_line}: board is not {size}x{size}")
+    if 'scores' not in state:
+        # every captured dot is a point for the other player
+        captured_dots = {1: 0, 2: 0}
+        for owners, captured in zip(state['owners'], state['captured']):
+            for owner, cap in zip(owners, captured):
+                if owner and cap:
+                    captured_dots[owner] += 1
+        state['scores'] = [captured_dots[2], captured_dots[1]]
+    state['size'] = size
+    state['game_over'] = not any(
+        owner == 0 and not cap
+        for owners, captured in zip(state['owners'], state['captured'])
+        for owner, cap in zip(owners, captured)
+    )
+    return state
+
+
+def read_blocks(f):
+    """Generator (numer pierwszej linii, linie) kolejnych pozycji, bez parsowania."""
+    block = []
+    start = 1
+    for i, line in enumerate(f, 1):
+        if line.strip() == SEPARATOR:
+            if any(l.strip() and not l.strip().startswith('#') for l in block):
+                yield start, block
+            block = []
+            start = i + 1
+        else:
+            block.append(line)
+    if any(l.strip() and not l.strip().startswith('#') for l in block):
+        yield start, block
+
+
+def read_positions(f):
+    """Generator pozycji z pliku tekstowego, czytanego linia po linii."""
+    for start, block in read_blocks(f):
+        yield parse_position(block, start)
+
+
+def write_positions(states, f):
+    for i, state in enumerate(states):
+        if i:
+            f.write(SEPARATOR + '\n')
+        f.write(format_position(state))
+
+
+def load_positions(path):
+    with open(path) as f:
+        return list(read_positions(f))
+
+
+def save_positions(path, states):
+    with open(path, 'w') as f:
+        write_positions(states, f)
@@ -0,0 +1,128 @@
+"""Renderowanie partii do obrazkow bez okna (przeglad partii, zgloszenia bledow).
+
+    python render.py games.jsonl -o images --frames --workers 4
+    python render.py positions.txt -o images --size 160
+
+Input is either game records, one JSON line per game with the moves in
+order (``{"moves": [[r, c], ...]}``, e.g. ``KropkiGame.history``), or a
+positions file (format in positions.py). Each game gives one thumbnail
+of the final position, and with ``--frames`` one image per move in its
+own directory.
+
+The board is drawn by the same ``draw_grid`` / ``draw_pieces`` as
+``KropkiGame.draw_game``, cropped to the board. Drawing goes straight to
+a ``pygame.Surface`` with the dummy video driver, so no window is opened.
+The background with the grid is drawn once per process and copied for
+every image.
+"""
+import argparse
+import json
+import os
+import shutil
+from multiprocessing import Pool
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+import pygame
+
+from last_min import KropkiGame, LOGICAL_GRID_SIZE, CELL_MARGIN, BG_COLOR, draw_grid, draw_pieces
+from positions import read_blocks, parse_position
+
+BOARD_SIZE = (LOGICAL_GRID_SIZE - 1) * CELL_MARGIN + 2 * CELL_MARGIN
+ORIGIN = (CELL_MARGIN, CELL_MARGIN)
+
+
+class BoardRenderer:
+    def __init__(self):
+        self.background = pygame.Surface((BOARD_SIZE, BOARD_SIZE))
+        self.background.fill(BG_COLOR)
+        draw_grid(self.background, ORIGIN)
+
+    def draw(self, game):
+        surface = self.background.copy()
+        draw_pieces(surface, game, ORIGIN)
+        return surface
+
+    def save(self, game, path, size=None):
+        surface = self.draw(game)
+        if size:
+            surface = pygame.transform.smoothscale(surface, (size, size))
+        pygame.image.save(surface, path)
+
+
+# -------------------- PRACA WSADOWA --------------------
+renderer = None
+worker_settings = {}
+
+
+def init_worker(settings):
+    global renderer
+    worker_settings.update(settings)
+    renderer = BoardRenderer()
+
+
+def render_job(item):
+    index, kind, data = item
+    out_dir = worker_settings['output']
+    size = worker_settings['size']
+    game = KropkiGame(headless=True)
+    frames = None
+    try:
+        if kind == 'position':
+            game.load_state(parse_position(*data))
+        else:
+            moves = json.loads(data)['moves']
+            if worker_settings['frames']:
+                frames = os.path.join(out_dir, f"{index:05d}")
+                os.makedirs(frames, exist_ok=True)
+                renderer.save(game, os.path.join(frames, "000.png"), size)
+            for i, (r, c) in enumerate(moves, 1):
+                on_board = 0 <= r < LOGICAL_GRID_SIZE and 0 <= c < LOGICAL_GRID_SIZE
+                if not on_board or not game.make_move(r, c):
+                    raise ValueError(f"move {i}: {r},{c} is not legal")
+                if worker_settings['frames']:
+                    renderer.save(game, os.path.join(frames, f"{i:03d}.png"), size)
+    except (ValueError, TypeError, KeyError) as e:
+        # one bad record is reported, the rest of the batch goes on;
+        # frames of a game that cannot be replayed are not kept
+        if frames is not None:
+            shutil.rmtree(frames, ignore_errors=True)
+        return {'index': index, 'error': f"{type(e).__name__}: {e}"}
+    path = os.path.join(out_dir, f"{index:05d}.png")
+    renderer.save(game, path, size)
+    return {'index': index, 'image': path}
+
+
+def read_jobs(path):
+    with open(path) as f:
+        first = f.readline()
+        f.seek(0)
+        if first.lstrip().startswith('{'):
+            # records and blocks are parsed in the worker, so a malformed one
+            # is reported there instead of ending the batch here
+            for index, line in enumerate(line for line in f if line.strip()):
+                yield index, 'game', line
+        else:
+            for index, (start, lines) in enumerate(read_blocks(f)):
+                yield index, 'position', (lines, start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Renderowanie partii Kropek do PNG")
+    parser.add_argument('input', help="zapisy partii (JSON lines z 'moves') albo plik z pozycjami")
+    parser.add_argument('-o', '--output', default='images')
+    parser.add_argument('--frames', action='store_true', help="obrazek po kazdym ruchu (tylko zapisy partii)")
+    parser.add_argument('--size', type=int, default=None, help="bok miniatury w pikselach")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=8)
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    settings = {'output': args.output, 'frames': args.frames, 'size': args.size}
+    with Pool(args.workers, initializer=init_worker, initargs=(settings,)) as pool:
+        for result in pool.imap_unordered(render_job, read_jobs(args.input), chunksize=args.chunksize):
+            if 'error' in result:
+                print(f"{result['index']}: {result['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""Serwer wielu gier Kropki (asyncio).
+
+Line-delimited JSON over TCP or a Unix socket. Every request is one JSON
+object per line, every reply is one JSON object per line:
+
+    {"cmd": "new", "ai": 2, "depth": 2}            -> {"ok": true, "game": 7, "state": {...}}
+    {"cmd": "move", "game": 7, "row": 3, "col": 4} -> {"ok": true, "game": 7, "state": {...}}
+    {"cmd": "state", "game": 7}                     -> {"ok": true, "game": 7, "state": {...}}
+    {"cmd": "close", "game": 7}                     -> {"ok": true, "game": 7}
+
+An optional "id" field is echoed back, so a client may pipeline requests.
+AI moves are computed in a bounded process pool. The worker searches on a
+clock that ends at the per-game time limit, and a job that waited in the
+queue past it returns at once; if the AI still does not answer in time a
+random legal move is played instead. A job that timed out keeps its pool
+slot until the worker finishes it. Games a connection created are dropped
+when it disconnects.
+Moves are applied to the board in a thread, so capture checks do not
+stall the event loop.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from last_min import KropkiGame, AIPlayer, RED, BLUE, LOGICAL_GRID_SIZE
+from timeman import TimeManager
+
+MAX_LINE = 64 * 1024
+# seconds kept from the AI's budget for sending the move back
+RESULT_MARGIN = 0.1
+
+
+def compute_ai_move(state, player_id, depth, deadline):
+    # runs inside a worker process; deadline: wall-clock time the server stops waiting
+    budget = deadline - time.time() - RESULT_MARGIN
+    if budget <= 0:
+        # waited in the queue past the limit, the server has already moved on
+        return None
+    game = KropkiGame(headless=True)
+    game.load_state(state)
+    clock = TimeManager(budget, max_share=1.0, safety=0.0, moves_left=1)
+    ai = AIPlayer(player_id, RED if player_id == 2 else BLUE, "AI", depth=depth, time_manager=clock)
+    return ai.get_move(game)
+
+
+async def play(game, row, col):
+    # capture search and threat update run in a thread, not on the event loop
+    return await asyncio.to_thread(game.make_move, row, col)
+
+
+class GameSession:
+    def __init__(self, game_id, ai_id, depth, move_time):
+        self.game_id = game_id
+        self.game = KropkiGame(headless=True)
+        self.ai_id = ai_id
+        self.depth = depth
+        self.move_time = move_time
+        self.lock = asyncio.Lock()
+        self.ai_timeouts = 0
+
+
+class GameServer:
+    def __init__(self, workers=None, max_pending=64, max_inflight=32, move_time=5.0, max_depth=3):
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        # backpressure: at most max_pending AI jobs queued in the pool,
+        # at most max_inflight unanswered requests per connection
+        self.ai_slots = asyncio.Semaphore(max_pending)
+        self.max_inflight = max_inflight
+        self.move_time = move_time
+        self.max_depth = max_depth
+        self.sessions = {}
+        self.ids = itertools.count(1)
+
+    # -------------------- AI --------------------
+    async def ai_move(self, session):
+        game = session.game
+        state = game.export_state()
+        loop = asyncio.get_running_loop()
+        await self.ai_slots.acquire()
+        deadline = time.time() + session.move_time
+        future = loop.run_in_executor(self.pool, compute_ai_move, state, session.ai_id, session.depth, deadline)
+        future.add_done_callback(self.release_slot)
+        try:
+            # shield: on timeout the job keeps its slot until the worker is really free
+            move = await asyncio.wait_for(asyncio.shield(future), session.move_time)
+        except asyncio.TimeoutError:
+            # the worker cannot be interrupted, its result is simply dropped
+            session.ai_timeouts += 1
+            move = None
+        if move is None or not await play(game, *move):
+            moves = game.legal_moves()
+            if moves:
+                await play(game, *random.choice(moves))
+
+    def release_slot(self, future):
+        if not future.cancelled():
+            future.exception()  # a late failure of a dropped job is not logged as unretrieved
+        self.ai_slots.release()
+
+    async def play_ai_turns(self, session):
+        game = session.game
+        while not game.game_over and game.turn == session.ai_id:
+            await self.ai_move(session)
+
+    # -------------------- KOMENDY --------------------
+    def get_session(self, request):
+        session = self.sessions.get(request.get('game'))
+        if session is None:
+            raise ValueError("unknown game")
+        return session
+
+    async def cmd_new(self, request, games):
+        ai_id = request.get('ai', 2)
+        if ai_id not in (0, 1, 2):
+            raise ValueError("ai must be 0, 1 or 2")
+        depth = max(1, min(int(request.get('depth', 2)), self.max_depth))
+        move_time = min(float(request.get('time', self.move_time)), self.move_time)
+        session = GameSession(next(self.ids), ai_id, depth, move_time)
+        self.sessions[session.game_id] = session
+        games.add(session.game_id)
+        async with session.lock:
+            await self.play_ai_turns(session)
+            return self.reply(session)
+
+    async def cmd_move(self, request, games):
+        session = self.get_session(request)
+        async with session.lock:
+            game = session.game
+            if game.game_over:
+                raise ValueError("game over")
+            if game.turn == session.ai_id:
+                raise ValueError("not your turn")
+            row, col = int(request['row']), int(request['col'])
+            if not (0 <= row < LOGICAL_GRID_SIZE and 0 <= col < LOGICAL_GRID_SIZE):
+                raise ValueError("move off the board")
+            if not await play(game, row, col):
+                raise ValueError("illegal move")
+            await self.play_ai_turns(session)
+            return self.reply(session)
+
+    async def cmd_state(self, request, games):
+        session = self.get_session(request)
+        async with session.lock:
+            return self.reply(session)
+
+    async def cmd_close(self, request, games):
+        session = self.get_session(request)
+        del self.sessions[session.game_id]
+        games.discard(session.game_id)
+        return {'ok': True, 'game': session.game_id}
+
+    def reply(self, session):
+        return {
+            'ok': True,
+            'game': session.game_id,
+            'ai_timeouts': session.ai_timeouts,
+            'state': session.game.export_state(),
+        }
+
+    async def dispatch(self, request, games):
+        # games: ids of the sessions this connection created
+        handler = getattr(self, 'cmd_' + str(request.get('cmd')), None)
+        if handler is None:
+            raise ValueError("unknown command")
+        return await handler(request, games)
+
+    # -------------------- POLACZENIA --------------------
+    async def handle_request(self, line, writer, write_lock, inflight, games):
+        try:
+            request = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("request must be an object")
+                response = await self.dispatch(request, games)
+            except (ValueError, KeyError, TypeError) as e:
+                response = {'ok': False, 'error': str(e)}
+            except Exception as e:
+                # every request gets an answer, or the client waits for it forever
+                response = {'ok': False, 'error': f"internal error: {type(e).__name__}: {e}"}
+            if isinstance(request, dict) and 'id' in request:
+                response['id'] = request['id']
+            async with write_lock:
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            inflight.release()
+
+    async def handle_client(self, reader, writer):
+        write_lock = asyncio.Lock()
+        inflight = asyncio.Semaphore(self.max_inflight)
+        tasks = set()
+        games = set()
+        try:
+            while True:
+                # stop reading from the socket while too many requests are pending
+                await inflight.acquire()
+                line = await reader.readline()
+                if not line:
+                    inflight.release()
+                    break
+                task = asyncio.create_task(self.handle_request(line, writer, write_lock, inflight, games))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except (ConnectionError, ValueError):
+            for task in tasks:
+                task.cancel()
+        finally:
+            # a client that disconnects without close must not leave its games behind
+            for game_id in games:
+                self.sessions.pop(game_id, None)
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765, unix=None):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle_client, path=unix, limit=MAX_LINE)
+        else:
+            server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serwer gier Kropki")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--unix', help="sciezka gniazda Unix zamiast TCP")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--max-pending', type=int, default=64)
+    parser.add_argument('--move-time', type=float, default=5.0)
+    parser.add_argument('--max-depth', type=int, default=3)
+    args = parser.parse_args()
+
+    async def run():
+        server = GameServer(args.workers, args.max_pending, move_time=args.move_time, max_depth=args.max_depth)
+        try:
+            await server.serve(args.host, args.port, args.unix)
+        finally:
+            server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""Lazy SMP: kilka procesow przeszukuje te sama pozycje ze wspolna tablica transpozycji.
+
+Helpers get the root position and search it with the normal
+``AIPlayer.search``, every other helper one ply deeper and each with the
+root moves in its own order, so they fill different parts of the tree.
+The main process runs its usual search; all of them read and write one
+``SharedTable``, so each one prunes with what the others found. When the
+main search ends the helpers are stopped and the result of a helper that
+finished a deeper search is preferred.
+
+``SharedTable`` has the ``BoundedTable`` interface (get / store / clear)
+over ``multiprocessing.shared_memory``. An entry is 16 bytes, the packed
+data (value float32, depth, flag) and ``key ^ data``. There are no locks:
+a torn write from two processes fails the XOR check and reads as a miss.
+"""
+import random
+import struct
+import weakref
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+from tables import BoundedTable
+
+DATA = struct.Struct('<fHBx')   # value, depth, flag
+WORD = struct.Struct('<Q')
+ENTRY_SIZE = 16
+HEADER_SIZE = 16                # stop generation counter, padding
+KEY_MASK = (1 << 64) - 1
+
+
+class SharedTable:
+    def __init__(self, entries, policy='depth', name=None):
+        if policy not in ('depth', 'always'):
+            raise ValueError(f"unknown replacement policy: {policy}")
+        self.policy = policy
+        self.ways = 2 if policy == 'depth' else 1
+        self.buckets = max(1, entries // self.ways)
+        size = HEADER_SIZE + self.buckets * self.ways * ENTRY_SIZE
+        self.owner = name is None
+        if self.owner:
+            self.shm = SharedMemory(create=True, size=size)
+            self.shm.buf[:size] = bytes(size)
+        else:
+            # helpers share the creator's resource tracker, so attaching does not
+            # register a second owner; only the creator unlinks the block
+            self.shm = SharedMemory(name=name)
+        self.buf = self.shm.buf
+
+    @classmethod
+    def for_budget(cls, budget_bytes, policy='depth'):
+        return cls(max(1, budget_bytes // ENTRY_SIZE), policy)
+
+    def spec(self):
+        """Argumenty dla SharedTable.attach w innym procesie."""
+        return self.shm.name, self.buckets * self.ways, self.policy
+
+    @classmethod
+    def attach(cls, name, entries, policy):
+        return cls(entries, policy, name)
+
+    def offset(self, slot):
+        return HEADER_SIZE + slot * ENTRY_SIZE
+
+    def read(self, slot):
+        """(klucz, dane) albo None dla pustego / rozdartego wpisu."""
+        off = self.offset(slot)
+        check, data = WORD.unpack_from(self.buf, off)[0], WORD.unpack_from(self.buf, off + 8)[0]
+        if data == 0:
+            return None
+        return check ^ data, data
+
+    def get(self, key):
+        key &= KEY_MASK
+        i = (key % self.buckets) * self.ways
+        for j in range(i, i + self.ways):
+            entry = self.read(j)
+            if entry is not None and entry[0] == key:
+                value, depth, flag = DATA.unpack(entry[1].to_bytes(8, 'little'))
+                return depth, value, flag
+        return None
+
+    def store(self, key, depth, value, flag=0):
+        key &= KEY_MASK
+        i = (key % self.buckets) * self.ways
+        if self.ways == 2:
+            old = self.read(i)
+            if old is not None and old[0] != key:
+                if DATA.unpack(old[1].to_bytes(8, 'little'))[1] > depth:
+                    i += 1
+        data = WORD.unpack(DATA.pack(value, min(depth, 0xFFFF), flag))[0]
+        off = self.offset(i)
+        WORD.pack_into(self.buf, off, key ^ data)
+        WORD.pack_into(self.buf, off + 8, data)
+
+    def clear(self):
+        size = len(self.buf) - HEADER_SIZE
+        self.buf[HEADER_SIZE:] = bytes(size)
+
+    def __len__(self):
+        return sum(1 for j in range(self.buckets * self.ways) if self.read(j) is not None)
+
+    # -------------------- ZATRZYMANIE --------------------
+    def generation(self):
+        return WORD.unpack_from(self.buf, 0)[0]
+
+    def bump(self):
+        WORD.pack_into(self.buf, 0, self.generation() + 1)
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class StopSignal:
+    """Zamiast TimeManager w pomocnikach: szuka az glowny proces zmieni licznik w tablicy."""
+
+    def __init__(self, table, generation):
+        self.table = table
+        self.generation = generation
+
+    def plan(self, *args):
+        pass
+
+    def next_iteration(self, score, best_changed):
+        return not self.expired()
+
+    def expired(self):
+        return self.table.generation() != self.generation
+
+
+# -------------------- POMOCNICY --------------------
+helper = {}
+
+
+def init_helper(spec, endgame_bytes):
+    helper['table'] = SharedTable.attach(*spec)
+    helper['endgame'] = BoundedTable.for_budget(endgame_bytes, 'depth')
+
+
+def helper_search(job):
+    from last_min import KropkiGame, AIPlayer, RED, BLUE
+
+    state, player_id, moves, depth, seed, generation, weights, settings = job
+    game = KropkiGame(headless=True)
+    game.load_state(state)
+    table = helper['table']
+    ai = AIPlayer(player_id, RED if player_id == 2 else BLUE, "SMP", depth=depth,
+                  weights_file=None, time_manager=StopSignal(table, generation), **settings)
+    ai.weights = weights
+    ai.tt = table
+    ai.endgame_cache = helper['endgame']
+    random.seed(seed)
+    random.shuffle(moves)
+    score, best_moves = ai.search(game, moves)
+    return ai.last_depth, score, best_moves
+
+
+class LazySMP:
+    def __init__(self, helpers, tt_bytes, endgame_bytes, policy='depth'):
+        self.table = SharedTable.for_budget(tt_bytes, policy)
+        self.helpers = helpers
+        self.pool = Pool(helpers, initializer=init_helper, initargs=(self.table.spec(), endgame_bytes))
+        self.pending = []
+        self.finalizer = weakref.finalize(self, LazySMP.shutdown, self.pool, self.table)
+
+    def start(self, ai, game, moves):
+        generation = self.table.generation()
+        state = game.export_state()
+        settings = ai.search_settings()
+        for i in range(1, self.helpers + 1):
+            job = (state, ai.player_id, list(moves), ai.depth + i % 2,
+                   random.getrandbits(32), generation, ai.weights, settings)
+            self.pending.append(self.pool.apply_async(helper_search, (job,)))
+
+    def stop(self):
+        """Zatrzymuje pomocnikow; [(glebokosc, wynik, ruchy)] z ich ukonczonych iteracji."""
+        self.table.bump()
+        results = [r.get() for r in self.pending]
+        self.pending = []
+        return [r for r in results if r[2]]
+
+    @staticmethod
+    def shutdown(pool, table):
+        pool.terminate()
+        pool.join()
+        table.close()
+
+    def close(self):
+        self.finalizer()
@@ -0,0 +1,77 @@
+"""Klucze pozycji niezalezne od symetrii planszy.
+
+A square board has 8 symmetries (4 rotations, each optionally mirrored).
+``SymmetryHash`` keeps one Zobrist hash per symmetry, each one hashing the
+board as seen through that transform, and updates all 8 with one XOR each
+when a cell changes. The canonical key is the smallest of the 8, so every
+position and its rotations/reflections share one key.
+"""
+import random
+
+# kod pola: owner * 2 + captured (0 = puste pole, bez klucza)
+CODES = 6
+
+
+def transforms(n):
+    m = n - 1
+    return [
+        lambda r, c: (r, c),
+        lambda r, c: (c, m - r),
+        lambda r, c: (m - r, m - c),
+        lambda r, c: (m - c, r),
+        lambda r, c: (r, m - c),
+        lambda r, c: (m - r, c),
+        lambda r, c: (c, r),
+        lambda r, c: (m - c, m - r),
+    ]
+
+
+class SymmetryHash:
+    tables = {}
+
+    def __init__(self, n):
+        self.n = n
+        self.zobrist, self.images = self.table(n)
+        self.hashes = [0] * 8
+
+    @classmethod
+    def table(cls, n):
+        # same random keys in every process, so keys can be shared between workers
+        if n not in cls.tables:
+            rng = random.Random(20240601 + n)
+            zobrist = [[rng.getrandbits(64) for _ in range(n * n)] for _ in range(CODES)]
+            images = [
+                [t(r, c)[0] * n + t(r, c)[1] for r in range(n) for c in range(n)]
+                for t in transforms(n)
+            ]
+            cls.tables[n] = (zobrist, images)
+        return cls.tables[n]
+
+    def toggle(self, r, c, code):
+        if code == 0:
+            return
+        keys = self.zobrist[code]
+        cell = r * self.n + c
+        hashes = self.hashes
+        for s, image in enumerate(self.images):
+            hashes[s] ^= keys[image[cell]]
+
+    def change(self, r, c, old_code, new_code):
+        self.toggle(r, c, old_code)
+        self.toggle(r, c, new_code)
+
+    def rebuild(self, grid):
+        self.hashes = [0] * 8
+        for r, row in enumerate(grid):
+            for c, cell in enumerate(row):
+                self.toggle(r, c, cell['owner'] * 2 + cell['captured'])
+
+    def key(self):
+        return min(self.hashes)
+
+
+def canonical_key(grid):
+    """Klucz kanoniczny liczony od zera (ksiazka otwarc, deduplikacja pozycji)."""
+    h = SymmetryHash(len(grid))
+    h.rebuild(grid)
+    return h.key()
@@ -0,0 +1,50 @@
+"""Tablice o stalym rozmiarze dla przeszukiwania (transpozycje, koncowki).
+
+Every table is allocated once with a fixed number of slots, so memory
+stays flat however long the search runs. Replacement policies:
+
+* ``depth``  - two-slot buckets: slot 0 keeps the deepest result,
+  slot 1 always takes the newest one
+* ``always`` - one slot per bucket, the newest result wins
+"""
+
+# przyblizony koszt jednego wpisu w Pythonie (klucz, krotka, liczby)
+ENTRY_BYTES = 160
+
+
+class BoundedTable:
+    def __init__(self, entries, policy='depth'):
+        if policy not in ('depth', 'always'):
+            raise ValueError(f"unknown replacement policy: {policy}")
+        self.policy = policy
+        self.ways = 2 if policy == 'depth' else 1
+        self.buckets = max(1, entries // self.ways)
+        self.keys = [None] * (self.buckets * self.ways)
+        self.data = [None] * (self.buckets * self.ways)
+
+    @classmethod
+    def for_budget(cls, budget_bytes, policy='depth'):
+        return cls(max(1, budget_bytes // ENTRY_BYTES), policy)
+
+    def get(self, key):
+        i = (key % self.buckets) * self.ways
+        for j in range(i, i + self.ways):
+            if self.keys[j] == key:
+                return self.data[j]
+        return None
+
+    def store(self, key, depth, *value):
+        i = (key % self.buckets) * self.ways
+        if self.ways == 2 and self.keys[i] != key:
+            old = self.data[i]
+            if old is not None and old[0] > depth:
+                i += 1
+        self.keys[i] = key
+        self.data[i] = (depth,) + value
+
+    def clear(self):
+        self.keys = [None] * len(self.keys)
+        self.data = [None] * len(self.data)
+
+    def __len__(self):
+        return sum(1 for k in self.keys if k is not None)
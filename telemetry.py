@@ -0,0 +1,180 @@
+"""Pomiary czasu klatki i czasu myslenia AI (eksport Prometheus / JSON).
+
+    KROPKI_METRICS=metrics.prom python last_min.py
+
+Every metric is a histogram of durations in seconds. The cumulative
+buckets, sum and count are exported in the Prometheus text format; the
+last ``window`` samples are kept as well, for the rolling percentiles
+in the JSON export. A file ending in ``.json`` gets JSON, anything else
+Prometheus text. The file is rewritten every ``interval`` seconds, on
+demand (F12 in the game window) and at exit, always through a temporary
+file, so a scraper never reads half of it.
+
+With telemetry off the game uses ``DISABLED``, whose methods do nothing.
+"""
+import json
+import os
+import time
+from collections import deque
+
+# seconds; frames live around 1-30 ms, AI moves up to many seconds
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.016, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+METRICS = {
+    'draw_game': "Czas KropkiGame.draw_game",
+    'draw_ui': "Czas KropkiGame.draw_ui",
+    'flip': "Czas pygame.display.flip",
+    'event_loop': "Odstep miedzy kolejnymi obsluzeniami zdarzen",
+    'ai_think': "Czas jednego ruchu AI",
+}
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=BUCKETS, window=1000):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+        self.total += seconds
+        self.count += 1
+        self.recent.append(seconds)
+
+    def percentile(self, p):
+        if not self.recent:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+    def prometheus(self, prefix):
+        name = f"{prefix}_{self.name}_seconds"
+        lines = [f"# HELP {name} {self.help}", f"# TYPE {name} histogram"]
+        cumulative = 0
+        for bound, n in zip(self.buckets, self.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self.count}')
+        lines.append(f"{name}_sum {self.total}")
+        lines.append(f"{name}_count {self.count}")
+        return lines
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'window': len(self.recent),
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': max(self.recent) if self.recent else None,
+        }
+
+
+class Timer:
+    __slots__ = ('histogram', 'start')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Telemetry:
+    enabled = True
+
+    def __init__(self, path=None, interval=None, window=1000, prefix='kropki'):
+        self.path = path
+        self.interval = interval
+        self.prefix = prefix
+        self.histograms = {name: Histogram(name, text, window=window) for name, text in METRICS.items()}
+        self.timers = {name: Timer(h) for name, h in self.histograms.items()}
+        self.next_write = time.monotonic() + interval if interval else None
+
+    def timer(self, name):
+        return self.timers[name]
+
+    def observe(self, name, seconds):
+        self.histograms[name].observe(seconds)
+
+    def prometheus(self):
+        lines = []
+        for h in self.histograms.values():
+            lines.extend(h.prometheus(self.prefix))
+        return '\n'.join(lines) + '\n'
+
+    def json(self):
+        return json.dumps({name: h.summary() for name, h in self.histograms.items()}, indent=2)
+
+    def write(self, path=None):
+        path = path or self.path
+        if not path:
+            return
+        text = self.json() if path.endswith('.json') else self.prometheus()
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def tick(self):
+        # called once per frame; writes the file when the interval has passed
+        if self.next_write is not None and time.monotonic() >= self.next_write:
+            self.next_write = time.monotonic() + self.interval
+            self.write()
+
+    def close(self):
+        self.write()
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullTelemetry:
+    enabled = False
+    null_timer = NullTimer()
+
+    def timer(self, name):
+        return self.null_timer
+
+    def observe(self, name, seconds):
+        pass
+
+    def write(self, path=None):
+        pass
+
+    def tick(self):
+        pass
+
+    def close(self):
+        pass
+
+
+DISABLED = NullTelemetry()
+
+
+def from_env():
+    """Telemetria wedlug KROPKI_METRICS (plik) i KROPKI_METRICS_INTERVAL (sekundy)."""
+    path = os.environ.get('KROPKI_METRICS')
+    if not path:
+        return DISABLED
+    return Telemetry(path, float(os.environ.get('KROPKI_METRICS_INTERVAL', 10)))
@@ -0,0 +1,137 @@
+"""Testy regul: skroty przy zbijaniu nie zmieniaja przebiegu gry.
+
+    python -m pytest -q test_rules.py
+
+``check_for_cycles_around`` skips find_cycle behind three gates: the
+chain union-find (chains.py), ``encloses_enemy`` and, in the AI, the
+threat candidates (threats.py). ``ReferenceGame`` runs find_cycle
+around every move, as the rules did before the gates, and random games
+are compared against it move by move. The threat candidates are checked
+against playing out every empty cell, and the persistent board (pboard.py)
+against the game it mirrors.
+"""
+import random
+
+from last_min import KropkiGame, LOGICAL_GRID_SIZE
+from pboard import Board
+from threats import capture_candidates
+
+GAMES = 12
+
+
+class ReferenceGame(KropkiGame):
+    """Reguly bez bramek: find_cycle dla ruchu i kazdego sasiada wroga."""
+
+    def check_for_cycles_around(self, r, c):
+        owner_of_last_move = self.grid[r][c]['owner']
+        self.sym_hash.toggle(r, c, owner_of_last_move * 2)
+        self.empty.discard((r, c))
+        self.empty_log.append((r, c))
+        self.chains.add((r, c), self.get_neighbors(r, c, owner_of_last_move))
+        cycle = self.find_cycle((r, c), owner_of_last_move)
+        if cycle:
+            self.captured_areas.append((cycle, owner_of_last_move))
+
+        enemy_id = 3 - owner_of_last_move
+        for dr in range(-1, 2):
+            for dc in range(-1, 2):
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < LOGICAL_GRID_SIZE and 0 <= nc < LOGICAL_GRID_SIZE:
+                    if self.grid[nr][nc]['owner'] == enemy_id and not self.grid[nr][nc]['captured']:
+                        cycle = self.find_cycle((nr, nc), enemy_id)
+                        if cycle:
+                            self.captured_areas.append((cycle, enemy_id))
+
+
+def board(game):
+    cells = [[(cell['owner'], cell['captured']) for cell in row] for row in game.grid]
+    return cells, game.player1.score, game.player2.score, game.captured_areas
+
+
+def empty_cells(game):
+    return {
+        (r, c)
+        for r in range(LOGICAL_GRID_SIZE)
+        for c in range(LOGICAL_GRID_SIZE)
+        if game.grid[r][c]['owner'] == 0 and not game.grid[r][c]['captured']
+    }
+
+
+def simulate(game, r, c, player_id):
+    # the way the AI tries a move: place the dot, check captures, restore
+    snap = game.snapshot()
+    game.grid[r][c]['owner'] = player_id
+    game.check_for_cycles_around(r, c)
+    result = board(game)
+    game.restore(snap)
+    return result
+
+
+def random_games(games=GAMES):
+    """Pary (gra, gra referencyjna) po kazdym ruchu losowych partii."""
+    for seed in range(games):
+        rnd = random.Random(seed)
+        game = KropkiGame(headless=True)
+        reference = ReferenceGame(headless=True)
+        while not game.game_over:
+            move = rnd.choice(game.legal_moves())
+            game.make_move(*move)
+            reference.make_move(*move)
+            yield game, reference
+
+
+def test_games_match_reference():
+    captures = 0
+    for game, reference in random_games():
+        assert board(game) == board(reference)
+        assert game.game_over == reference.game_over
+        assert game.empty == empty_cells(game)
+        captures += len(game.captured_areas)
+    # the games have to exercise the capture rules at all
+    assert captures > 0
+
+
+def test_simulated_moves_match_reference():
+    # every move the AI could try, for both players, also against positions
+    # the game itself never reaches; restore must undo the chains as well
+    for game, reference in random_games(GAMES // 4):
+        chains = dict(game.chains.parent)
+        for r, c in game.legal_moves():
+            for player_id in (1, 2):
+                assert simulate(game, r, c, player_id) == simulate(reference, r, c, player_id)
+        assert game.chains.parent == chains
+        assert game.empty == empty_cells(game)
+
+
+def test_threat_candidates_cover_every_capture():
+    for game, _ in random_games():
+        for player_id in (1, 2):
+            candidates = set(game.threats.candidates(player_id))
+            # the incremental map agrees with a fresh scan
+            assert candidates == set(capture_candidates(game, player_id))
+            score = game.players[player_id].score
+            for r, c in game.legal_moves():
+                snap = game.snapshot()
+                game.grid[r][c]['owner'] = player_id
+                game.check_for_cycles_around(r, c)
+                gained = game.players[player_id].score > score
+                game.restore(snap)
+                if gained:
+                    assert (r, c) in candidates
+
+
+def test_persistent_board_matches_game():
+    for seed in range(GAMES):
+        rnd = random.Random(seed)
+        game = KropkiGame(headless=True)
+        board = Board.new()
+        while not game.game_over:
+            move = rnd.choice(game.legal_moves())
+            game.make_move(*move)
+            parent, parent_state = board, board.to_state()
+            board = board.play(*move)
+            assert board.to_state() == game.export_state()
+            assert board.key() == game.position_key()
+            assert board.legal_moves() == game.legal_moves()
+            # a move never touches the board it was played on
+            assert parent.to_state() == parent_state
@@ -0,0 +1,195 @@
+"""Analiza grozb: ktore ruchy moga zamknac obwod (dla obu graczy naraz).
+
+For player P the board is split into regions by P's uncaptured dots
+(a fence of 8-connected dots cannot be crossed by a 4-connected path).
+One DFS from the area outside the board finds the articulation cells:
+empty cells whose occupation cuts some part of the board off from the
+outside. A move can only capture if it cuts off an uncaptured enemy dot,
+so these cells (plus a fallback for enemy dots already sitting inside a
+closed pocket) are the only moves worth simulating.
+
+The result is a superset filter; the exact gain still comes from playing
+the move with ``check_for_cycles_around``.
+"""
+
+
+class Analysis:
+    def __init__(self, grid, player_id):
+        self.player_id = player_id
+        self.n = len(grid)
+        self.disc = {}            # pole -> czas odkrycia w DFS
+        self.separations = {}     # pole -> [(lo, hi)] zakresy odcinanych poddrzew
+        self.candidates = {}      # pole -> ile kropek wroga odcina
+        self.pocket_enemy = False
+        self.build(grid)
+
+    def passable(self, cell):
+        return not (cell['owner'] == self.player_id and not cell['captured'])
+
+    def build(self, grid):
+        n = self.n
+        enemy_id = 3 - self.player_id
+        out = (-1, -1)
+
+        def neighbors(v):
+            if v == out:
+                border = [(r, c) for r in range(n) for c in range(n) if r in (0, n - 1) or c in (0, n - 1)]
+                return [p for p in border if self.passable(grid[p[0]][p[1]])]
+            r, c = v
+            result = []
+            for dr, dc in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                nr, nc = r + dr, c + dc
+                if 0 <= nr < n and 0 <= nc < n:
+                    if self.passable(grid[nr][nc]):
+                        result.append((nr, nc))
+                else:
+                    result.append(out)
+            return result
+
+        disc = {out: 0}
+        low = {out: 0}
+        parent = {out: None}
+        enemy_at = [0]
+        stack = [(out, iter(neighbors(out)))]
+        t = 1
+        while stack:
+            v, it = stack[-1]
+            for w in it:
+                if w not in disc:
+                    disc[w] = low[w] = t
+                    t += 1
+                    parent[w] = v
+                    cell = grid[w[0]][w[1]]
+                    enemy_at.append(1 if cell['owner'] == enemy_id and not cell['captured'] else 0)
+                    stack.append((w, iter(neighbors(w))))
+                    break
+                elif w != parent[v]:
+                    low[v] = min(low[v], disc[w])
+            else:
+                stack.pop()
+                if stack:
+                    p = stack[-1][0]
+                    low[p] = min(low[p], low[v])
+                    if p != out and low[v] >= disc[p]:
+                        self.separations.setdefault(p, []).append((disc[v], t))
+
+        prefix = [0]
+        for e in enemy_at:
+            prefix.append(prefix[-1] + e)
+
+        del disc[out]
+        self.disc = disc
+        for p, ranges in self.separations.items():
+            cell = grid[p[0]][p[1]]
+            if cell['owner'] != 0 or cell['captured']:
+                continue
+            enemies = sum(prefix[hi] - prefix[lo] for lo, hi in ranges)
+            if enemies:
+                self.candidates[p] = enemies
+
+        # kropki wroga w zamknietej kieszeni (nie dotknietej obwodem, wiec nie zbitej)
+        for r in range(n):
+            for c in range(n):
+                cell = grid[r][c]
+                if (r, c) not in disc and cell['owner'] == enemy_id and not cell['captured']:
+                    self.pocket_enemy = True
+        if self.pocket_enemy:
+            self.add_pocket_fallback(grid)
+
+    def add_pocket_fallback(self, grid):
+        # any cell touching two of our dots may close a fence around the pocket
+        n = self.n
+        for r in range(n):
+            for c in range(n):
+                if grid[r][c]['owner'] != 0 or grid[r][c]['captured'] or (r, c) in self.candidates:
+                    continue
+                own = 0
+                for dr in (-1, 0, 1):
+                    for dc in (-1, 0, 1):
+                        nr, nc = r + dr, c + dc
+                        if (dr or dc) and 0 <= nr < n and 0 <= nc < n:
+                            if grid[nr][nc]['owner'] == self.player_id and not grid[nr][nc]['captured']:
+                                own += 1
+                if own >= 2:
+                    self.candidates[(r, c)] = 0
+
+    def add_enemy_dot(self, grid, r, c):
+        # enemy played at (r, c): same regions, one more dot to cut off
+        self.candidates.pop((r, c), None)
+        self.separations.pop((r, c), None)
+        d = self.disc.get((r, c))
+        if d is None:
+            if not self.pocket_enemy:
+                self.pocket_enemy = True
+                self.add_pocket_fallback(grid)
+            return
+        for p, ranges in self.separations.items():
+            cell = grid[p[0]][p[1]]
+            if cell['owner'] != 0 or cell['captured']:
+                continue
+            hits = sum(1 for lo, hi in ranges if lo <= d < hi)
+            if hits:
+                self.candidates[p] = self.candidates.get(p, 0) + hits
+
+
+class ThreatMap:
+    """Ruchy zbijajace dla obu graczy, aktualizowane po kazdym make_move."""
+
+    def __init__(self, game):
+        self.game = game
+        self.refresh()
+
+    def refresh(self):
+        grid = self.game.grid
+        self.analysis = {1: Analysis(grid, 1), 2: Analysis(grid, 2)}
+        self.areas = len(self.game.captured_areas)
+
+    def update(self, r, c):
+        game = self.game
+        if len(game.captured_areas) != self.areas:
+            # a fence closed: captured cells change both players' regions
+            self.refresh()
+            return
+        mover_id = game.grid[r][c]['owner']
+        self.analysis[mover_id] = Analysis(game.grid, mover_id)
+        self.analysis[3 - mover_id].add_enemy_dot(game.grid, r, c)
+
+    def candidates(self, player_id):
+        return self.analysis[player_id].candidates
+
+
+def capture_candidates(game, player_id):
+    """Jednorazowa analiza (np. wewnatrz przeszukiwania, gdzie ThreatMap nie nadaza)."""
+    return Analysis(game.grid, player_id).candidates
+
+
+def encloses_enemy(grid, player_id):
+    """Czy jakas nie zbita kropka wroga jest odcieta od brzegu przez kropki player_id.
+
+    A fence that captures must cut its dots off from the board edge, so when
+    this is False no cycle search for player_id can capture anything.
+    """
+    n = len(grid)
+    enemy_id = 3 - player_id
+    seen = [[False] * n for _ in range(n)]
+    stack = []
+    for r in range(n):
+        for c in range(n):
+            if (r in (0, n - 1) or c in (0, n - 1)) and not (
+                    grid[r][c]['owner'] == player_id and not grid[r][c]['captured']):
+                seen[r][c] = True
+                stack.append((r, c))
+    while stack:
+        r, c = stack.pop()
+        for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if 0 <= nr < n and 0 <= nc < n and not seen[nr][nc]:
+                cell = grid[nr][nc]
+                if not (cell['owner'] == player_id and not cell['captured']):
+                    seen[nr][nc] = True
+                    stack.append((nr, nc))
+    for r in range(n):
+        for c in range(n):
+            cell = grid[r][c]
+            if cell['owner'] == enemy_id and not cell['captured'] and not seen[r][c]:
+                return True
+    return False
@@ -0,0 +1,111 @@
+"""Zarzadzanie czasem: budzet na ruch z zegara partii.
+
+The clock is split by the number of own moves still expected (about half
+of the empty cells, every empty cell is a legal move), then scaled by the
+game phase:
+
+* opening   - few dots on the board, the search has little to find
+* middle    - full budget, more when capture threats are pending
+* endgame   - positions under ``endgame_empty`` are solved exactly anyway
+
+Every move gets a soft budget and a hard deadline. Iterative deepening
+asks ``next_iteration`` before each new depth: it stops when the next
+iteration would not fit (its cost is the last one times the branching
+factor measured between iterations) and gives more time while the root
+score is still swinging. The hard deadline is polled by the search and
+ends it with ``SearchTimeout``.
+"""
+import time
+
+
+class SearchTimeout(Exception):
+    """Twardy limit czasu ruchu przekroczony w trakcie przeszukiwania."""
+
+
+class TimeManager:
+    def __init__(self, total, increment=0.0, min_move=0.05, max_share=0.25,
+                 safety=0.05, volatility=300, moves_left=None):
+        # total / increment: seconds for the whole game / added after every move
+        self.remaining = total
+        self.increment = increment
+        # moves_left: own moves the clock is split over; None = estimated from the
+        # empty cells, 1 with max_share=1.0 makes total the budget of one move
+        self.moves_left = moves_left
+        self.min_move = min_move
+        # max_share: no single move may take more than this part of the clock
+        self.max_share = max_share
+        self.safety = safety
+        # volatility: a root score swing this big between iterations counts as unstable
+        self.volatility = volatility
+        self.move_start = None
+        self.soft = None
+        self.deadline = None
+        self.iteration_start = None
+        self.last_iteration = None
+        self.branching = None
+        self.prev_score = None
+
+    # -------------------- ZEGAR --------------------
+    def start_move(self):
+        self.move_start = time.monotonic()
+        self.soft = None
+        self.deadline = None
+
+    def end_move(self):
+        self.remaining = max(0.0, self.remaining - self.elapsed()) + self.increment
+        self.move_start = None
+        self.deadline = None
+
+    def elapsed(self):
+        return time.monotonic() - self.move_start
+
+    # -------------------- BUDZET --------------------
+    def phase_factor(self, empty, cells, endgame_empty):
+        filled = 1 - empty / cells
+        if empty <= endgame_empty:
+            return 0.5
+        if filled < 0.15:
+            return 0.4
+        if filled < 0.3:
+            return 0.8
+        return 1.3
+
+    def plan(self, empty, cells, threats, endgame_empty=0):
+        """Ustala miekki budzet i twardy termin dla biezacego ruchu (w sekundach)."""
+        moves_left = self.moves_left or max(1, (empty + 1) // 2)
+        base = (self.remaining + self.increment * (moves_left - 1)) / moves_left
+        soft = base * self.phase_factor(empty, cells, endgame_empty)
+        if threats:
+            # open fences on the board: captures can swing the result, think longer
+            soft *= 1 + min(threats, 4) * 0.15
+
+        cap = max(self.min_move, self.remaining * self.max_share - self.safety)
+        self.soft = max(self.min_move, min(soft, cap))
+        self.deadline = self.move_start + max(self.min_move, min(self.soft * 3, cap))
+        self.iteration_start = time.monotonic()
+        self.last_iteration = None
+        self.branching = None
+        self.prev_score = None
+        return self.soft, self.deadline - self.move_start
+
+    def next_iteration(self, score, best_changed):
+        """Czy zaczac kolejna iteracje (po zakonczeniu poprzedniej z wynikiem score)."""
+        now = time.monotonic()
+        took = now - self.iteration_start
+        if self.last_iteration:
+            self.branching = max(1.5, took / self.last_iteration)
+        self.last_iteration = took
+        self.iteration_start = now
+
+        soft = self.soft
+        unstable = best_changed or (
+            self.prev_score is not None and abs(score - self.prev_score) >= self.volatility)
+        if unstable:
+            soft *= 1.6
+        self.prev_score = score
+
+        predicted = took * (self.branching or 4)
+        return now - self.move_start + predicted <= soft and now < self.deadline
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() >= self.deadline
@@ -0,0 +1,250 @@
+"""Turniej miedzy konfiguracjami AI (testy regresji silnika).
+
+    python tournament.py --engine new depth=3,clock=20 --engine base depth=2 \\
+        --games 400 --workers 4 --sprt 0,10 -o match.jsonl
+
+Every ``--engine`` is a name and ``key=value`` settings: ``clock`` and
+``increment`` give the engine a TimeManager (seconds per game), any other
+key is passed to AIPlayer (depth, weights_file, quiescence, ...).
+Engines play a round robin in pairs of games with swapped colours and the
+same random seed. Elo and the SPRT are reported for the engine given
+first against the later one (``--engine new ... --engine base ...``).
+
+Games are handed out one at a time from the pool's shared task queue, so
+a worker that finishes early takes the next game. Every finished game is
+appended to the checkpoint file right away; running the same command
+again skips the games already in it. Scores are reported as Elo with a
+95% margin; with two engines and ``--sprt elo0,elo1`` the run stops as
+soon as the sequential probability ratio test accepts either hypothesis.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import time
+from itertools import combinations
+from multiprocessing import Pool
+
+from last_min import KropkiGame, AIPlayer, RED, BLUE
+from timeman import TimeManager
+
+
+# -------------------- SILNIKI --------------------
+def parse_settings(text):
+    settings = {}
+    for item in filter(None, text.split(',')):
+        key, sep, value = item.partition('=')
+        if not sep:
+            raise ValueError(f"engine setting needs key=value: {item!r}")
+        try:
+            settings[key] = json.loads(value)
+        except ValueError:
+            settings[key] = value
+    return settings
+
+
+def make_player(player_id, name, settings):
+    settings = dict(settings)
+    clock = settings.pop('clock', None)
+    increment = settings.pop('increment', 0.0)
+    if clock is not None:
+        settings['time_manager'] = TimeManager(clock, increment)
+    return AIPlayer(player_id, BLUE if player_id == 1 else RED, name, **settings)
+
+
+def play_game(job):
+    game_id, seed, (name1, settings1), (name2, settings2) = job
+    random.seed(seed)
+    t0 = time.perf_counter()
+    game = KropkiGame(headless=True)
+    players = {1: make_player(1, name1, settings1), 2: make_player(2, name2, settings2)}
+    while not game.game_over:
+        move = players[game.turn].get_move(game)
+        if move is None:
+            break
+        game.make_move(*move)
+    s1, s2 = game.player1.score, game.player2.score
+    return {
+        'game': game_id, 'p1': name1, 'p2': name2, 'score': [s1, s2],
+        'result': 1.0 if s1 > s2 else 0.0 if s1 < s2 else 0.5,
+        'moves': game.history, 'time': round(time.perf_counter() - t0, 2),
+    }
+
+
+def schedule(engines, games, seed):
+    """Partia nr i: para silnikow, kolory na zmiane, to samo ziarno dla obu kolorow."""
+    names = list(engines)
+    pairs = list(combinations(names, 2))
+    for game_id in range(games):
+        a, b = pairs[(game_id // 2) % len(pairs)]
+        if game_id % 2:
+            a, b = b, a
+        yield game_id, seed + game_id // 2, (a, engines[a]), (b, engines[b])
+
+
+# -------------------- STATYSTYKA --------------------
+class Stats:
+    """Wygrane / remisy / porazki dla kazdej pary, z punktu widzenia silnika podanego wczesniej."""
+
+    def __init__(self, names):
+        self.order = {name: i for i, name in enumerate(names)}
+        self.wdl = {}
+
+    def add(self, record):
+        a, b = sorted((record['p1'], record['p2']), key=self.order.get)
+        result = record['result'] if record['p1'] == a else 1.0 - record['result']
+        w, d, l = self.wdl.get((a, b), (0, 0, 0))
+        self.wdl[a, b] = (w + (result == 1.0), d + (result == 0.5), l + (result == 0.0))
+
+    def score(self, pair):
+        """(sredni wynik, wariancja jednej partii, liczba partii)."""
+        w, d, l = self.wdl.get(pair, (0, 0, 0))
+        n = w + d + l
+        if n == 0:
+            return 0.5, 0.0, 0
+        score = (w + d / 2) / n
+        return score, (w + d / 4) / n - score ** 2, n
+
+    def elo(self, pair):
+        """(roznica Elo, margines 95%) albo None, dopoki wynik nie lezy scisle miedzy 0 a 1."""
+        score, var, n = self.score(pair)
+        if not 0 < score < 1:
+            return None
+        margin = 1.96 * math.sqrt(var / n)
+        lo, hi = max(score - margin, 1e-6), min(score + margin, 1 - 1e-6)
+        return score_to_elo(score), (score_to_elo(hi) - score_to_elo(lo)) / 2
+
+    def llr(self, pair, elo0, elo1):
+        """Log-iloraz wiarygodnosci H1 (elo1) do H0 (elo0), przyblizenie normalne wyniku."""
+        score, var, n = self.score(pair)
+        if var <= 0:
+            return 0.0
+        s0, s1 = elo_to_score(elo0), elo_to_score(elo1)
+        return (s1 - s0) * (2 * score - s0 - s1) / (2 * var / n)
+
+
+def score_to_elo(score):
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def sprt_bounds(alpha, beta):
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def report(stats, sprt=None):
+    lines = []
+    for pair, (w, d, l) in sorted(stats.wdl.items()):
+        line = f"{pair[0]} - {pair[1]}: +{w} ={d} -{l}"
+        elo = stats.elo(pair)
+        if elo is not None:
+            line += f"  Elo {elo[0]:+.1f} +/- {elo[1]:.1f}"
+        if sprt:
+            lower, upper = sprt_bounds(sprt['alpha'], sprt['beta'])
+            line += f"  LLR {stats.llr(pair, sprt['elo0'], sprt['elo1']):.2f} [{lower:.2f}, {upper:.2f}]"
+        lines.append(line)
+    return '\n'.join(lines)
+
+
+# -------------------- CHECKPOINT --------------------
+def load_checkpoint(path, config):
+    """(czy jest naglowek, partie juz rozegrane); plik zaczyna sie od naglowka z konfiguracja."""
+    if not os.path.exists(path):
+        return False, []
+    lines = []
+    with open(path, 'r+') as f:
+        good = 0
+        for line in iter(f.readline, ''):
+            if not line.endswith('\n'):
+                # the run was killed while writing this line: drop it, the game is replayed
+                f.truncate(good)
+                break
+            if line.strip():
+                lines.append(json.loads(line))
+            good = f.tell()
+    headers = [line['config'] for line in lines if 'config' in line]
+    if any(header != config for header in headers):
+        raise ValueError(f"{path} was written by a different tournament configuration")
+    # header lines are never game records (older runs could write a second one)
+    return bool(headers), [line for line in lines if 'config' not in line]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Turniej konfiguracji AI z zapisem postepu")
+    parser.add_argument('--engine', nargs=2, action='append', metavar=('NAME', 'SETTINGS'), required=True,
+                        help="nazwa i ustawienia, np. new depth=3,clock=20")
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--sprt', default=None, metavar='ELO0,ELO1', help="test SPRT (tylko dla dwoch silnikow)")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--beta', type=float, default=0.05)
+    parser.add_argument('-o', '--checkpoint', default='tournament.jsonl')
+    args = parser.parse_args()
+
+    engines = {}
+    for name, text in args.engine:
+        if name in engines:
+            parser.error(f"duplicate engine name: {name}")
+        engines[name] = parse_settings(text)
+    if len(engines) < 2:
+        parser.error("a tournament needs at least two engines")
+    sprt = None
+    if args.sprt:
+        if len(engines) != 2:
+            parser.error("--sprt needs exactly two engines")
+        elo0, elo1 = (float(x) for x in args.sprt.split(','))
+        sprt = {'elo0': elo0, 'elo1': elo1, 'alpha': args.alpha, 'beta': args.beta}
+    # SPRT / Elo are for the first engine against the second
+    pair = tuple(engines)
+
+    config = {'engines': engines, 'seed': args.seed}
+    has_header, done = load_checkpoint(args.checkpoint, config)
+    stats = Stats(list(engines))
+    for record in done:
+        stats.add(record)
+    finished = {record['game'] for record in done}
+    if done:
+        print(f"wznowienie: {len(done)} partii z {args.checkpoint}")
+
+    def decided():
+        if not sprt:
+            return None
+        lower, upper = sprt_bounds(sprt['alpha'], sprt['beta'])
+        llr = stats.llr(pair, sprt['elo0'], sprt['elo1'])
+        if llr >= upper:
+            return 'H1'
+        if llr <= lower:
+            return 'H0'
+        return None
+
+    jobs = [job for job in schedule(engines, args.games, args.seed) if job[0] not in finished]
+    result = decided()
+    if jobs and result is None:
+        with open(args.checkpoint, 'a') as out:
+            if not has_header:
+                out.write(json.dumps({'config': config}) + '\n')
+            # leaving the with block terminates the pool: after an SPRT decision
+            # the games still running are dropped, the test no longer needs them
+            with Pool(args.workers) as pool:
+                for record in pool.imap_unordered(play_game, jobs):
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                    stats.add(record)
+                    print(f"partia {record['game']}: {record['p1']} - {record['p2']} "
+                          f"{record['score'][0]}:{record['score'][1]}")
+                    result = decided()
+                    if result:
+                        break
+
+    print(report(stats, sprt))
+    if result:
+        print(f"SPRT: przyjeto {result} ({'elo1' if result == 'H1' else 'elo0'})")
+
+
+if __name__ == "__main__":
+    main()
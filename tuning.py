@@ -0,0 +1,180 @@
+"""Strojenie wag evaluate_board na partiach self-play (metoda Texela).
+
+    python tuning.py selfplay --games 2000 -o games.jsonl
+    python tuning.py features games.jsonl -o features.npz
+    python tuning.py fit features.npz
+
+``selfplay`` plays AI-vs-AI games in a process pool and writes every
+position with the final result (1 / 0.5 / 0 for player 1), skipping
+positions already seen up to board symmetry. ``features`` turns the
+positions into one NumPy feature matrix (both players' points of view).
+``fit`` minimises the mean squared error between sigmoid(K * eval / 1000)
+and the result with full-batch Adam, K fitted first for the start weights.
+The output is the weights file AIPlayer loads at startup.
+"""
+import argparse
+import json
+import random
+from multiprocessing import Pool
+
+import numpy as np
+
+from batch_eval import FEATURES, extract_features, weight_vector
+from last_min import KropkiGame, AIPlayer, EVAL_WEIGHTS, RED, BLUE, WEIGHTS_FILE, load_weights
+from symmetry import canonical_key
+
+CHUNK = 4096
+SCALE = 1000.0
+
+
+# -------------------- SELF-PLAY --------------------
+def play_game(args):
+    seed, depth = args
+    random.seed(seed)
+    game = KropkiGame(headless=True)
+    players = {
+        1: AIPlayer(1, BLUE, "AI 1", depth=depth, weights_file=None),
+        2: AIPlayer(2, RED, "AI 2", depth=depth, weights_file=None),
+    }
+    states = []
+    while not game.game_over:
+        states.append(game.export_state())
+        move = players[game.turn].get_move(game)
+        if move is None:
+            break
+        game.make_move(*move)
+    s1, s2 = game.player1.score, game.player2.score
+    result = 1.0 if s1 > s2 else 0.0 if s1 < s2 else 0.5
+    return states, result
+
+
+def selfplay(args):
+    seen = set()
+    written = 0
+    with Pool(args.workers) as pool, open(args.output, 'w') as out:
+        jobs = ((args.seed + i, args.depth) for i in range(args.games))
+        for states, result in pool.imap_unordered(play_game, jobs):
+            for state in states:
+                grid = [
+                    [{'owner': owner, 'captured': bool(cap)} for owner, cap in zip(owners, captured)]
+                    for owners, captured in zip(state['owners'], state['captured'])
+                ]
+                key = (canonical_key(grid), state['turn'])
+                if key in seen:
+                    continue
+                seen.add(key)
+                out.write(json.dumps({'state': state, 'result': result}) + '\n')
+                written += 1
+    print(f"pozycje: {written}")
+
+
+# -------------------- CECHY --------------------
+def feature_chunks(path):
+    with open(path) as f:
+        batch = []
+        for line in f:
+            batch.append(json.loads(line))
+            if len(batch) == CHUNK:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def chunk_features(batch):
+    owners = np.array([item['state']['owners'] for item in batch], dtype=np.int8)
+    captured = np.array([item['state']['captured'] for item in batch], dtype=bool)
+    scores = np.array([item['state']['scores'] for item in batch], dtype=np.float64)
+    results = np.array([item['result'] for item in batch], dtype=np.float64)
+    x1 = extract_features(owners, captured, scores[:, 0], scores[:, 1], 1)
+    x2 = extract_features(owners, captured, scores[:, 1], scores[:, 0], 2)
+    return np.concatenate([x1, x2]), np.concatenate([results, 1.0 - results])
+
+
+def features(args):
+    xs, ys = [], []
+    for batch in feature_chunks(args.input):
+        x, y = chunk_features(batch)
+        xs.append(x)
+        ys.append(y)
+    x = np.concatenate(xs) if xs else np.empty((0, len(FEATURES)))
+    y = np.concatenate(ys) if ys else np.empty(0)
+    np.savez_compressed(args.output, x=x, y=y, features=np.array(FEATURES))
+    print(f"wiersze: {len(y)}")
+
+
+# -------------------- DOPASOWANIE --------------------
+def sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -50, 50)))
+
+
+def loss(x, y, w, k):
+    return np.mean((sigmoid(k * (x @ w) / SCALE) - y) ** 2)
+
+
+def fit_k(x, y, w):
+    # the scale of the start weights decides K; a coarse log-space search is enough
+    ks = np.logspace(-3, 1, 81)
+    return ks[np.argmin([loss(x, y, w, k) for k in ks])]
+
+
+def fit(args):
+    data = np.load(args.input)
+    x, y = data['x'], data['y']
+    if list(data['features']) != FEATURES:
+        raise ValueError("feature file was built for a different feature list")
+
+    start = load_weights(args.start) if args.start else EVAL_WEIGHTS
+    w = weight_vector(start)
+    k = fit_k(x, y, w)
+    print(f"K = {k:.4f}, strata poczatkowa = {loss(x, y, w, k):.5f}")
+
+    m = np.zeros_like(w)
+    v = np.zeros_like(w)
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for step in range(1, args.steps + 1):
+        p = sigmoid(k * (x @ w) / SCALE)
+        grad = (2.0 * k / SCALE) * (x.T @ ((p - y) * p * (1.0 - p))) / len(y)
+        m = beta1 * m + (1 - beta1) * grad
+        v = beta2 * v + (1 - beta2) * grad ** 2
+        w -= args.lr * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+        if step % 100 == 0:
+            print(f"krok {step}: strata = {loss(x, y, w, k):.5f}")
+
+    weights = {name: int(round(value)) for name, value in zip(FEATURES, w)}
+    with open(args.output, 'w') as f:
+        json.dump(weights, f, indent=2)
+    print(json.dumps(weights))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Strojenie wag oceny pozycji")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('selfplay')
+    p.add_argument('--games', type=int, default=1000)
+    p.add_argument('--depth', type=int, default=1)
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-o', '--output', default='games.jsonl')
+    p.set_defaults(func=selfplay)
+
+    p = sub.add_parser('features')
+    p.add_argument('input')
+    p.add_argument('-o', '--output', default='features.npz')
+    p.set_defaults(func=features)
+
+    p = sub.add_parser('fit')
+    p.add_argument('input')
+    p.add_argument('-o', '--output', default=WEIGHTS_FILE, help="plik wag (domyslnie ten, ktory wczytuje AIPlayer)")
+    p.add_argument('--start', help="plik wag startowych (domyslnie wagi z last_min.py)")
+    p.add_argument('--steps', type=int, default=2000)
+    p.add_argument('--lr', type=float, default=5.0)
+    p.set_defaults(func=fit)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()